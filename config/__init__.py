@@ -26,6 +26,13 @@ class BaseConfig:
     # Ограничения на размер загружаемых файлов (50 МБ)
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024
 
+    # Серверные сессии (Flask-Session): в cookie остаётся только идентификатор,
+    # списки загрузок/экспортов/истории хранятся на диске
+    SESSION_TYPE = "cachelib"
+    SESSION_PERMANENT = False
+    SESSION_FILE_DIR = TEMP_FOLDER / "sessions"
+    SESSION_FILE_THRESHOLD = 5000
+
 
 def ensure_directories():
     """Гарантирует наличие требуемых директорий и файлов."""
@@ -1,13 +1,14 @@
 """Парсер XML файлов с вопросами"""
 
-import xml.etree.ElementTree as ET
-from typing import List, Optional
+import io
+from typing import Iterator, List, Optional
 from pathlib import Path
-import re
+
+from lxml import etree
 
 from ..models.question import Question
 from ..models.course import Course
-from ..utils.file_utils import clean_xml_file, validate_xml_file
+from ..utils.file_utils import clean_xml_file, validate_xml
 
 
 class XMLParser:
@@ -24,8 +25,6 @@ class XMLParser:
             xml_file_path: Путь к XML файлу
         """
         self.xml_file_path = Path(xml_file_path)
-        self.tree = None
-        self.root = None
     
     def parse(self) -> List[Question]:
         """
@@ -51,94 +50,83 @@ class XMLParser:
         if not self.xml_file_path.exists():
             raise FileNotFoundError(f"XML файл не найден: {self.xml_file_path}")
         
+        # Читаем файл один раз: одни и те же байты идут и в проверку, и в очистку
+        xml_bytes = self.xml_file_path.read_bytes()
+        
         # Проверяем корректность XML файла перед обработкой
-        is_valid, error_message = validate_xml_file(self.xml_file_path)
+        is_valid, error_message = validate_xml(xml_bytes)
         if not is_valid:
             print(f"Предупреждение: XML файл содержит ошибки. {error_message}")
             print("Попытка очистки и повторного парсинга...")
         
-        # Читаем XML файл как текст и очищаем от CDATA и HTML тегов
-        with open(self.xml_file_path, 'r', encoding='utf-8') as f:
-            xml_content = f.read()
+        # Декодируем как текст и очищаем от CDATA и HTML тегов
+        xml_content = xml_bytes.decode('utf-8')
         
         # Очищаем XML от CDATA и HTML тегов
         cleaned_xml = clean_xml_file(xml_content)
         
-        # Парсим очищенный XML из строки
+        courses = []
+        current_course_name: Optional[str] = None
+        current_course: Optional[Course] = None
+        last_category_name: Optional[str] = None
+        
+        # Элементы question приходят потоком в порядке документа (важно сохранить порядок)
         try:
-            self.root = ET.fromstring(cleaned_xml)
-            self.tree = ET.ElementTree(self.root)
-        except ET.ParseError as e:
+            for question_elem in self._iter_question_elements(cleaned_xml):
+                question_type = question_elem.get('type', '')
+                
+                if question_type == 'category':
+                    # Это категория - извлекаем название
+                    category_name = self._extract_course_name(question_elem)
+                    
+                    # Если это валидная категория (не None)
+                    if category_name:
+                        # Если уже был курс с вопросами, сохраняем его
+                        if current_course is not None and len(current_course) > 0:
+                            courses.append(current_course)
+                        
+                        # Сохраняем название категории, но еще не создаем курс
+                        # Курс будет создан только если после этой категории идут вопросы
+                        last_category_name = category_name
+                        current_course_name = None
+                        current_course = None
+                else:
+                    # Это вопрос
+                    # Если есть последняя категория, она становится курсом
+                    if last_category_name is not None and current_course is None:
+                        current_course_name = last_category_name
+                        current_course = Course(name=current_course_name)
+                        last_category_name = None  # Сбрасываем, т.к. использовали
+                    
+                    # Если курс уже создан, добавляем вопрос
+                    if current_course is not None:
+                        question_data = self._parse_question_element(question_elem)
+                        question = Question.from_dict(question_data)
+                        current_course.add_question(question)
+                    else:
+                        # Вопросы без категории курса - создаем курс с дефолтным именем
+                        current_course_name = "Без категории"
+                        current_course = Course(name=current_course_name)
+                        question_data = self._parse_question_element(question_elem)
+                        question = Question.from_dict(question_data)
+                        current_course.add_question(question)
+        except etree.XMLSyntaxError as e:
             # Если после очистки все еще есть ошибки, сообщаем об этом
             error_msg = str(e)
-            line_match = re.search(r'line (\d+)', error_msg)
-            col_match = re.search(r'column (\d+)', error_msg)
+            line_num, col_num = e.position if e.position else (e.lineno, None)
             
-            if line_match:
-                line_num = line_match.group(1)
-                col_num = col_match.group(1) if col_match else "?"
+            if line_num:
                 raise ValueError(
-                    f"Ошибка парсинга XML после очистки на строке {line_num}, столбец {col_num}. "
+                    f"Ошибка парсинга XML после очистки на строке {line_num}, столбец {col_num or '?'}. "
                     f"{f'Исходная ошибка: {error_message}. ' if not is_valid else ''}"
                     f"Ошибка после очистки: {error_msg}"
-                )
+                ) from e
             else:
                 raise ValueError(
                     f"Ошибка парсинга XML после очистки. "
                     f"{f'Исходная ошибка: {error_message}. ' if not is_valid else ''}"
                     f"Ошибка после очистки: {error_msg}"
-                )
-        
-        courses = []
-        current_course_name: Optional[str] = None
-        current_course: Optional[Course] = None
-        last_category_name: Optional[str] = None
-        
-        # Получаем все элементы question по порядку (важно сохранить порядок)
-        all_elements = list(self.root.findall('.//question'))
-        
-        i = 0
-        while i < len(all_elements):
-            question_elem = all_elements[i]
-            question_type = question_elem.get('type', '')
-            
-            if question_type == 'category':
-                # Это категория - извлекаем название
-                category_name = self._extract_course_name(question_elem)
-                
-                # Если это валидная категория (не None)
-                if category_name:
-                    # Если уже был курс с вопросами, сохраняем его
-                    if current_course is not None and len(current_course) > 0:
-                        courses.append(current_course)
-                    
-                    # Сохраняем название категории, но еще не создаем курс
-                    # Курс будет создан только если после этой категории идут вопросы
-                    last_category_name = category_name
-                    current_course_name = None
-                    current_course = None
-            else:
-                # Это вопрос
-                # Если есть последняя категория, она становится курсом
-                if last_category_name is not None and current_course is None:
-                    current_course_name = last_category_name
-                    current_course = Course(name=current_course_name)
-                    last_category_name = None  # Сбрасываем, т.к. использовали
-                
-                # Если курс уже создан, добавляем вопрос
-                if current_course is not None:
-                    question_data = self._parse_question_element(question_elem)
-                    question = Question.from_dict(question_data)
-                    current_course.add_question(question)
-                else:
-                    # Вопросы без категории курса - создаем курс с дефолтным именем
-                    current_course_name = "Без категории"
-                    current_course = Course(name=current_course_name)
-                    question_data = self._parse_question_element(question_elem)
-                    question = Question.from_dict(question_data)
-                    current_course.add_question(question)
-            
-            i += 1
+                ) from e
         
         # Добавляем последний курс, если он есть
         if current_course is not None and len(current_course) > 0:
@@ -146,6 +134,29 @@ class XMLParser:
         
         return courses
     
+    @staticmethod
+    def _iter_question_elements(cleaned_xml: str) -> Iterator[etree._Element]:
+        """
+        Потоковый обход элементов question (lxml iterparse)
+        
+        Каждый элемент очищается сразу после обработки вызывающим кодом,
+        поэтому в памяти не накапливается дерево всего документа.
+        
+        Args:
+            cleaned_xml: Очищенный XML
+            
+        Yields:
+            Элементы question в порядке документа
+        """
+        source = io.BytesIO(cleaned_xml.encode('utf-8'))
+        for _, elem in etree.iterparse(source, events=('end',), tag='question'):
+            yield elem
+            elem.clear()
+            # Удаляем уже обработанные соседние элементы, чтобы родитель не держал пустые узлы
+            parent = elem.getparent()
+            while parent is not None and elem.getprevious() is not None:
+                del parent[0]
+    
     def _extract_course_name(self, category_element) -> Optional[str]:
         """
         Извлечение названия курса из категории
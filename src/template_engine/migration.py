@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import copy
 from typing import Any, Dict
 
 from .presets import preset_table_default
@@ -9,7 +10,8 @@ def migrate_v1_to_v2(v1: dict[str, Any], question_type: str) -> dict[str, Any]:
     """
     Best-effort миграция старого конфига (v1 styles/layout) к v2 blocks.
     """
-    v2 = preset_table_default(question_type)
+    # Пресет общий (lru_cache), а ниже мы его меняем
+    v2 = copy.deepcopy(preset_table_default(question_type))
     styles = v2.get("styles", {})
 
     v1_styles = v1.get("styles") if isinstance(v1.get("styles"), dict) else {}
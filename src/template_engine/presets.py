@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Any
 
 
+# Пресеты кешируются и возвращаются общими объектами: изменять их нельзя, при необходимости — copy.deepcopy.
+# Тип приходит и из запросов (предпросмотр, формы), поэтому размер кеша ограничен.
+@lru_cache(maxsize=64)
 def preset_table_default(question_type: str) -> dict[str, Any]:
     # “как было”: текст вопроса + таблица ответов
     if question_type == "matching":
@@ -96,6 +100,7 @@ def preset_dash_answer(question_type: str) -> dict[str, Any]:
     }
 
 
+@lru_cache(maxsize=64)
 def presets_for_type(question_type: str) -> list[dict[str, Any]]:
     return [
         {"id": "table_default", "name": "Стандарт (таблица/список)", "config": preset_table_default(question_type)},
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 import html
+import io
 import re
-from typing import Any, Dict, List
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, List
 
 from .validator import validate_template_config_v2
 
@@ -26,7 +31,55 @@ def _get_question_view(question: dict[str, Any]) -> dict[str, Any]:
     }
 
 
-def _eval_pipe(expr: str, ctx: dict[str, Any], item: Any | None = None) -> str:
+# Скомпилированный плейсхолдер: (ctx, item) -> str
+Getter = Callable[[dict[str, Any], Any], str]
+# Скомпилированный паттерн: пары (литерал, геттер | None)
+Segments = tuple[tuple[str, Getter | None], ...]
+
+_ctx_question = itemgetter("question")
+_ctx_metadata = itemgetter("metadata")
+
+
+def _empty(ctx: dict[str, Any], item: Any) -> str:
+    return ""
+
+
+def _task_header(ctx: dict[str, Any], item: Any) -> str:
+    return str(ctx.get("task_header") or "")
+
+
+def _item(ctx: dict[str, Any], item: Any) -> str:
+    return "" if item is None else str(item)
+
+
+def _scope_field(scope: Callable[[dict[str, Any]], dict[str, Any]], key: str) -> Getter:
+    def get(ctx: dict[str, Any], item: Any) -> str:
+        data = scope(ctx)
+        return str(data[key] or "") if key in data else ""
+
+    return get
+
+
+def _item_field(key: str) -> Getter:
+    def get(ctx: dict[str, Any], item: Any) -> str:
+        return str(item.get(key, "") or "") if isinstance(item, dict) else ""
+
+    return get
+
+
+def _if_correct(base: Getter, mark: str | None) -> Getter:
+    # mark=None -> само значение (if_correct), иначе фиксированная метка (is_correct)
+    def get(ctx: dict[str, Any], item: Any) -> str:
+        val = base(ctx, item)
+        correct = set(ctx["question"].get("correct_answers") or [])
+        if val not in correct:
+            return ""
+        return val if mark is None else mark
+
+    return get
+
+
+def _compile_expr(expr: str) -> Getter:
     """
     Minimal placeholder engine:
     - {{question.field}}
@@ -40,42 +93,176 @@ def _eval_pipe(expr: str, ctx: dict[str, Any], item: Any | None = None) -> str:
         base, op = [p.strip() for p in expr.split("|", 1)]
         if op == "is_correct":
             # returns "+" if item in correct_answers else ""
-            val = _eval_pipe(base, ctx, item=item)
-            correct = set(ctx["question"].get("correct_answers") or [])
-            return "+" if val in correct else ""
+            return _if_correct(_compile_expr(base), "+")
         if op == "if_correct":
             # returns value if item in correct_answers else ""
-            val = _eval_pipe(base, ctx, item=item)
-            correct = set(ctx["question"].get("correct_answers") or [])
-            return val if val in correct else ""
-        return _eval_pipe(base, ctx, item=item)
+            return _if_correct(_compile_expr(base), None)
+        return _compile_expr(base)
 
     if expr.startswith("question."):
-        key = expr[len("question.") :]
-        return "" if key not in ctx["question"] else str(ctx["question"].get(key) or "")
+        return _scope_field(_ctx_question, expr[len("question.") :])
     if expr.startswith("metadata."):
-        key = expr[len("metadata.") :]
-        return "" if key not in ctx["metadata"] else str(ctx["metadata"].get(key) or "")
+        return _scope_field(_ctx_metadata, expr[len("metadata.") :])
     if expr == "task.header":
-        return str(ctx.get("task_header") or "")
+        return _task_header
     if expr == "item":
-        return "" if item is None else str(item)
-    if expr.startswith("item.") and isinstance(item, dict):
-        return str(item.get(expr[len("item.") :], "") or "")
-    return ""
+        return _item
+    if expr.startswith("item."):
+        return _item_field(expr[len("item.") :])
+    return _empty
 
 
-def _render_pattern(pattern: str, ctx: dict[str, Any], item: Any | None = None) -> str:
-    def repl(m: re.Match) -> str:
-        return _esc(_eval_pipe(m.group(1), ctx, item=item))
+@lru_cache(maxsize=512)
+def _compile_pattern(pattern: str) -> Segments:
+    segments: list[tuple[str, Getter | None]] = []
+    pos = 0
+    for m in _EXPR_RE.finditer(pattern):
+        segments.append((pattern[pos : m.start()], _compile_expr(m.group(1))))
+        pos = m.end()
+    segments.append((pattern[pos:], None))
+    return tuple(segments)
 
-    return _EXPR_RE.sub(repl, pattern)
 
+def _render_pattern(segments: Segments, ctx: dict[str, Any], item: Any | None = None) -> str:
+    return "".join(lit if get is None else lit + _esc(get(ctx, item)) for lit, get in segments)
 
-def render_question_html(cfg: dict[str, Any], question: dict[str, Any], metadata: dict[str, Any], task_number: int) -> str:
+
+def _items_for_source(question: dict[str, Any], source: Any) -> list[Any]:
+    if source == "answers_all":
+        return question.get("answers") or []
+    if source == "answers_correct":
+        return question.get("correct_answers") or []
+    if source == "matching_pairs":
+        return question.get("matching_items") or []
+    return []
+
+
+def _r_line(b: dict[str, Any], ctx: dict[str, Any], question: dict[str, Any], out: io.StringIO) -> None:
+    out.write(f"<div class='line'>{_render_pattern(b['segments'], ctx)}</div>")
+
+
+def _r_spacer(b: dict[str, Any], ctx: dict[str, Any], question: dict[str, Any], out: io.StringIO) -> None:
+    mm = int(b.get("mm", 4))
+    out.write(f"<div style='height:{mm}mm'></div>")
+
+
+def _r_list(b: dict[str, Any], ctx: dict[str, Any], question: dict[str, Any], out: io.StringIO) -> None:
+    segments = b["segments"]
+    items = _items_for_source(question, b.get("source"))
+    tag = "ul" if bool(b.get("bullet", True)) else "ol"
+    write = out.write
+    write(f"<{tag}>")
+    for x in items:
+        write(f"<li>{_render_pattern(segments, ctx, item=x)}</li>")
+    if not items:
+        write("<li></li>")
+    write(f"</{tag}>")
+
+
+def _r_table(b: dict[str, Any], ctx: dict[str, Any], question: dict[str, Any], out: io.StringIO) -> None:
+    # head_html / col_open / col_close заранее посчитаны в compile_template
+    cols = b["cols"]
+    col_open = b["col_open"]
+    col_close = b["col_close"]
+    items = _items_for_source(question, b.get("source"))
+
+    write = out.write
+    write(b["table_open"])
+    for it in items or [None]:
+        write("<tr>")
+        for i, segments in enumerate(cols):
+            write(col_open[i])
+            write(_render_pattern(segments, ctx, item=it))
+            write(col_close)
+        write("</tr>")
+    write("</tbody></table>")
+
+
+def _compile_line(b: dict[str, Any]) -> dict[str, Any]:
+    return {**b, "segments": _compile_pattern(b.get("pattern", ""))}
+
+
+def _compile_list(b: dict[str, Any]) -> dict[str, Any]:
+    return {**b, "segments": _compile_pattern(b.get("pattern", "{{item}}"))}
+
+
+def _compile_table(b: dict[str, Any]) -> dict[str, Any]:
+    headers = b.get("headers") or []
+    cols = b.get("cols") or []
+    widths = b.get("col_widths_pct") or []
+
+    col_count = len(cols)
+    if widths and len(widths) == col_count:
+        width_style = [f"width:{int(w)}%" for w in widths]
+    else:
+        width_style = ["" for _ in range(col_count)]
+
+    head_html = ""
+    if headers and len(headers) == col_count:
+        ths = "".join(f"<th style='{_esc(width_style[i])}'>{_esc(headers[i])}</th>" for i in range(col_count))
+        head_html = f"<thead><tr>{ths}</tr></thead>"
+
+    return {
+        **b,
+        "cols": [_compile_pattern(c) for c in cols],
+        "table_open": sys.intern(f"<table>{head_html}<tbody>"),
+        "col_open": [sys.intern(f"<td style='{_esc(ws)}'>") for ws in width_style],
+        "col_close": "</td>",
+    }
+
+
+_BLOCK_RENDERERS = {
+    "line": _r_line,
+    "list": _r_list,
+    "table": _r_table,
+    "spacer": _r_spacer,
+}
+
+
+_BLOCK_COMPILERS = {
+    "line": _compile_line,
+    "list": _compile_list,
+    "table": _compile_table,
+}
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    Шаблон v2, подготовленный к многократному рендерингу:
+    проверен один раз, а не зависящие от вопроса части блоков посчитаны заранее.
+    """
+
+    errors: tuple[str, ...]
+    blocks: tuple[dict[str, Any], ...]
+
+
+def compile_template(cfg: dict[str, Any]) -> CompiledTemplate:
     errors = validate_template_config_v2(cfg)
     if errors:
-        return f"<div class='muted'>Template error: {_esc('; '.join(errors))}</div>"
+        return CompiledTemplate(errors=tuple(errors), blocks=())
+    blocks = []
+    for b in cfg.get("blocks") or []:
+        compiler = _BLOCK_COMPILERS.get(b.get("kind"))
+        blocks.append(compiler(b) if compiler else b)
+    return CompiledTemplate(errors=(), blocks=tuple(blocks))
+
+
+def render_question_html(cfg: dict[str, Any], question: dict[str, Any], metadata: dict[str, Any], task_number: int) -> str:
+    buf = io.StringIO()
+    _render_into(buf, compile_template(cfg), question, metadata, task_number)
+    return buf.getvalue()
+
+
+def _render_into(
+    buf: io.StringIO, tpl: CompiledTemplate, question: dict[str, Any], metadata: dict[str, Any], task_number: int
+) -> None:
+    """
+    Пишет HTML вопроса прямо в `buf` (без промежуточного списка фрагментов).
+    """
+    if tpl.errors:
+        buf.write(f"<div class='muted'>Template error: {_esc('; '.join(tpl.errors))}</div>")
+        return
 
     qv = _get_question_view(question)
     task_header = (
@@ -86,66 +273,47 @@ def render_question_html(cfg: dict[str, Any], question: dict[str, Any], metadata
     )
     ctx = {"question": qv, "metadata": metadata, "task_header": task_header}
 
-    blocks: List[dict[str, Any]] = cfg.get("blocks") or []
-    out: List[str] = []
-    for b in blocks:
-        kind = b.get("kind")
-        if kind == "line":
-            out.append(f"<div class='line'>{_render_pattern(b.get('pattern',''), ctx)}</div>")
-        elif kind == "spacer":
-            mm = int(b.get("mm", 4))
-            out.append(f"<div style='height:{mm}mm'></div>")
-        elif kind == "list":
-            source = b.get("source")
-            pattern = b.get("pattern", "{{item}}")
-            bullet = bool(b.get("bullet", True))
-            items: list[Any] = []
-            if source == "answers_all":
-                items = question.get("answers") or []
-            elif source == "answers_correct":
-                items = question.get("correct_answers") or []
-            elif source == "matching_pairs":
-                items = question.get("matching_items") or []
-            tag = "ul" if bullet else "ol"
-            lis = "".join(f"<li>{_render_pattern(pattern, ctx, item=x)}</li>" for x in items) or "<li></li>"
-            out.append(f"<{tag}>{lis}</{tag}>")
-        elif kind == "table":
-            source = b.get("source")
-            headers = b.get("headers") or []
-            cols = b.get("cols") or []
-            widths = b.get("col_widths_pct") or []
-
-            items: list[Any] = []
-            if source == "answers_all":
-                items = question.get("answers") or []
-            elif source == "answers_correct":
-                items = question.get("correct_answers") or []
-            elif source == "matching_pairs":
-                items = question.get("matching_items") or []
-
-            col_count = len(cols)
-            if widths and len(widths) == col_count:
-                width_style = [f"width:{int(w)}%" for w in widths]
-            else:
-                width_style = ["" for _ in range(col_count)]
-
-            head_html = ""
-            if headers and len(headers) == col_count:
-                ths = "".join(
-                    f"<th style='{_esc(width_style[i])}'>{_esc(headers[i])}</th>" for i in range(col_count)
-                )
-                head_html = f"<thead><tr>{ths}</tr></thead>"
-
-            rows_html = []
-            for it in items or [None]:
-                tds = "".join(
-                    f"<td style='{_esc(width_style[i])}'>{_render_pattern(cols[i], ctx, item=it)}</td>"
-                    for i in range(col_count)
-                )
-                rows_html.append(f"<tr>{tds}</tr>")
-            out.append(f"<table>{head_html}<tbody>{''.join(rows_html)}</tbody></table>")
-
-    return "\n".join(out)
+    for n, b in enumerate(tpl.blocks):
+        if n:
+            buf.write("\n")
+        try:
+            renderer = _BLOCK_RENDERERS[b.get("kind")]
+        except KeyError:
+            # validate_template_config_v2 уже отсекает неизвестные kind; страхуемся на случай рассинхрона
+            kind = b.get("kind")
+            buf.write(f"<div class='muted'>Template error: {_esc(f'blocks[{n}].kind invalid: {kind}')}</div>")
+            continue
+        renderer(b, ctx, question, buf)
+
+
+@lru_cache(maxsize=64)
+def _doc_shell(title: str, header_color: str, body_size: int, title_size: int, header_size: int) -> tuple[str, str]:
+    """
+    Статическая "обёртка" документа (doctype, <head> с CSS, заголовок) и её хвост.
+    Зависит только от заголовка и стилей, поэтому кешируется между вызовами.
+    `header_color` ожидается уже экранированным.
+    """
+    css = f"""
+    body{{font-family: "Times New Roman", Times, serif; font-size:{body_size}px; padding:28mm 15mm 20mm 30mm;}}
+    h1{{text-align:center; font-size:{title_size}px; margin:0 0 12mm 0;}}
+    .task{{color:{header_color}; font-style:italic; font-size:{header_size}px; margin:6mm 0 0 0;}}
+    .line{{margin:2mm 0;}}
+    table{{border-collapse:collapse; width:100%; table-layout:fixed;}}
+    td,th{{border:1px solid #000; padding:6px 8px; vertical-align:top; word-wrap:break-word;}}
+    .muted{{color:#666;}}
+    """
+    head_html = "\n".join(
+        [
+            "<!doctype html>",
+            "<html lang='ru'>",
+            "<head><meta charset='utf-8'/><meta name='viewport' content='width=device-width, initial-scale=1'/>",
+            f"<title>{_esc(title)}</title><style>{css}</style></head>",
+            "<body>",
+            f"<h1>{_esc(title)}</h1>",
+            "",
+        ]
+    )
+    return head_html, "</body></html>"
 
 
 def render_document_html(
@@ -155,40 +323,34 @@ def render_document_html(
     title: str,
 ) -> str:
     styles_cfg = next((t.get("styles") for t in templates_by_type.values() if isinstance(t, dict)), {}) or {}
-    header_color = styles_cfg.get("header_color", "#C00000")
-    body_size = styles_cfg.get("body_size", 14)
-    title_size = styles_cfg.get("title_size", 22)
-    header_size = styles_cfg.get("header_size", 16)
-
-    css = f"""
-    body{{font-family: "Times New Roman", Times, serif; font-size:{int(body_size)}px; padding:28mm 15mm 20mm 30mm;}}
-    h1{{text-align:center; font-size:{int(title_size)}px; margin:0 0 12mm 0;}}
-    .task{{color:{_esc(header_color)}; font-style:italic; font-size:{int(header_size)}px; margin:6mm 0 0 0;}}
-    .line{{margin:2mm 0;}}
-    table{{border-collapse:collapse; width:100%; table-layout:fixed;}}
-    td,th{{border:1px solid #000; padding:6px 8px; vertical-align:top; word-wrap:break-word;}}
-    .muted{{color:#666;}}
-    """
+    head_html, tail_html = _doc_shell(
+        "" if title is None else str(title),
+        _esc(styles_cfg.get("header_color", "#C00000")),
+        int(styles_cfg.get("body_size", 14)),
+        int(styles_cfg.get("title_size", 22)),
+        int(styles_cfg.get("header_size", 16)),
+    )
 
-    parts = [
-        "<!doctype html>",
-        "<html lang='ru'>",
-        "<head><meta charset='utf-8'/><meta name='viewport' content='width=device-width, initial-scale=1'/>",
-        f"<title>{_esc(title)}</title><style>{css}</style></head>",
-        "<body>",
-        f"<h1>{_esc(title)}</h1>",
-    ]
+    buf = io.StringIO()
+    write = buf.write
+    write(head_html)
 
+    # Таблица диспетчеризации документа: тип -> скомпилированный шаблон (None — шаблона нет).
+    # Заполняется при первой встрече типа, дальше на вопрос приходится один поиск по словарю.
+    dispatch: dict[str, CompiledTemplate | None] = {}
     for i, q in enumerate(questions, start=1):
         q_type = q.get("type", "")
-        cfg = templates_by_type.get(q_type)
-        if not cfg:
-            parts.append(f"<div class='muted'>Нет шаблона для типа {_esc(q_type)} (пропущено)</div>")
+        try:
+            tpl = dispatch[q_type]
+        except KeyError:
+            cfg = templates_by_type.get(q_type)
+            tpl = dispatch[q_type] = compile_template(cfg) if cfg else None
+        if tpl is None:
+            write(f"<div class='muted'>Нет шаблона для типа {_esc(q_type)} (пропущено)</div>\n")
             continue
-        parts.append(f"<div class='task'></div>")
-        parts.append(render_question_html(cfg, q, metadata, i))
-
-    parts.append("</body></html>")
-    return "\n".join(parts)
-
+        write("<div class='task'></div>\n")
+        _render_into(buf, tpl, q, metadata, i)
+        write("\n")
 
+    write(tail_html)
+    return buf.getvalue()
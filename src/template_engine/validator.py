@@ -3,6 +3,10 @@ from __future__ import annotations
 from typing import Any
 
 
+_VALID_KINDS = frozenset({"line", "list", "table", "spacer"})
+_VALID_SOURCES = frozenset({"answers_all", "answers_correct", "matching_pairs"})
+
+
 def validate_template_config_v2(cfg: dict[str, Any]) -> list[str]:
     errors: list[str] = []
     if not isinstance(cfg, dict):
@@ -20,11 +24,12 @@ def validate_template_config_v2(cfg: dict[str, Any]) -> list[str]:
         return errors
 
     for i, b in enumerate(blocks):
-        if not isinstance(b, dict):
+        # конфиги приходят из json.loads, подклассы dict здесь не ожидаются
+        if type(b) is not dict:
             errors.append(f"blocks[{i}] must be an object")
             continue
         kind = b.get("kind")
-        if kind not in {"line", "list", "table", "spacer"}:
+        if kind not in _VALID_KINDS:
             errors.append(f"blocks[{i}].kind invalid: {kind}")
             continue
         if kind == "line":
@@ -35,12 +40,12 @@ def validate_template_config_v2(cfg: dict[str, Any]) -> list[str]:
             if not isinstance(mm, int) or mm < 0 or mm > 50:
                 errors.append(f"blocks[{i}].mm must be int 0..50")
         elif kind == "list":
-            if b.get("source") not in {"answers_all", "answers_correct", "matching_pairs"}:
+            if b.get("source") not in _VALID_SOURCES:
                 errors.append(f"blocks[{i}].source invalid")
             if not isinstance(b.get("pattern"), str) or not b["pattern"].strip():
                 errors.append(f"blocks[{i}].pattern is required")
         elif kind == "table":
-            if b.get("source") not in {"answers_all", "answers_correct", "matching_pairs"}:
+            if b.get("source") not in _VALID_SOURCES:
                 errors.append(f"blocks[{i}].source invalid")
             cols = b.get("cols")
             if not isinstance(cols, list) or not cols:
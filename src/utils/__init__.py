@@ -1,6 +1,6 @@
 """Вспомогательные утилиты"""
 
-from .file_utils import sanitize_filename, clean_xml_file, validate_xml_file
+from .file_utils import sanitize_filename, clean_xml_file, validate_xml, validate_xml_file
 
-__all__ = ['sanitize_filename', 'clean_xml_file', 'validate_xml_file']
+__all__ = ['sanitize_filename', 'clean_xml_file', 'validate_xml', 'validate_xml_file']
 
@@ -0,0 +1,49 @@
+"""Быстрый JSON: orjson, если установлен, иначе стандартный json"""
+
+import json
+from typing import Any, Union
+
+try:
+    # orjson: C-реализация, в разы быстрее stdlib json
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson.JSONDecodeError — подкласс json.JSONDecodeError, поэтому ловить достаточно его
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Разбор JSON из строки или байтов"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Сериализация в JSON (UTF-8 байты) без экранирования не-ASCII символов
+
+    Args:
+        obj: Объект для сериализации
+        indent: Форматировать с отступом в 2 пробела (как json.dumps(..., indent=2))
+        sort_keys: Сортировать ключи словарей (канонический вид)
+
+    Returns:
+        JSON в кодировке UTF-8
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            # Типы, которые orjson не умеет (например, целые больше 64 бит), — через stdlib
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, sort_keys=sort_keys).encode('utf-8')
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """Как dumps_bytes, но возвращает строку"""
+    if orjson is None:
+        return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, sort_keys=sort_keys)
+    return dumps_bytes(obj, indent=indent, sort_keys=sort_keys).decode('utf-8')
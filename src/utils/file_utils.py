@@ -1,10 +1,137 @@
 """Утилиты для работы с файлами"""
 
 import re
+import string
 from pathlib import Path
 from typing import Optional, Tuple
 import xml.etree.ElementTree as ET
 
+try:
+    # google-re2: линейное время на больших выгрузках и на "злых" входных данных
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
+
+try:
+    # pyahocorasick: поиск всех тегов за один линейный проход
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# Паттерн для поиска CDATA блоков: <![CDATA[ ... ]]>
+# Флаги задаются inline, т.к. их понимают и `re`, и `re2`.
+_CDATA_RE = _re_engine.compile(r'(?s)<!\[CDATA\[(.*?)\]\]>')
+
+# Известные HTML теги (например, <p>, </p>, <br/> и т.д.), объединённые в одну альтернативу.
+# Открывающий тег не может содержать '<': иначе "A1<B2 ... <br>" съедал бы текст до '>' следующего тега.
+_HTML_TAG_PATTERNS = [
+    r'<p[^<>]*>', r'</p>',
+    r'<br[^<>]*/?>',
+    r'<div[^<>]*>', r'</div>',
+    r'<span[^<>]*>', r'</span>',
+    r'<strong[^<>]*>', r'</strong>',
+    r'<b[^<>]*>', r'</b>',
+    r'<em[^<>]*>', r'</em>',
+    r'<i[^<>]*>', r'</i>',
+    r'<u[^<>]*>', r'</u>',
+    r'<ul[^<>]*>', r'</ul>',
+    r'<ol[^<>]*>', r'</ol>',
+    r'<li[^<>]*>', r'</li>',
+    r'<table[^<>]*>', r'</table>',
+    r'<tr[^<>]*>', r'</tr>',
+    r'<td[^<>]*>', r'</td>',
+    r'<th[^<>]*>', r'</th>',
+]
+# Регистр сворачивается заранее (см. _TAG_FOLD), поэтому паттерн без (?i)
+_HTML_TAG_RE = _re_engine.compile('|'.join(_HTML_TAG_PATTERNS))
+
+# Свёртка регистра как у re.IGNORECASE для букв тегов: ASCII плюс İ/ı -> i и ſ -> s
+# (re2 их не сворачивает). Длина строки не меняется, индексы совпадают с оригиналом.
+_TAG_FOLD = str.maketrans(
+    {**{upper: lower for upper, lower in zip(string.ascii_uppercase, string.ascii_lowercase)},
+     'İ': 'i', 'ı': 'i', 'ſ': 's'}
+)
+
+# Те же теги для Aho-Corasick: открывающий тег удаляется до первого '>' (если раньше нет '<'), закрывающий — целиком
+_HTML_TAG_OPENERS = [
+    '<p', '<br', '<div', '<span', '<strong', '<b', '<em', '<i',
+    '<u', '<ul', '<ol', '<li', '<table', '<tr', '<td', '<th',
+]
+_HTML_TAG_CLOSERS = [
+    '</p>', '</div>', '</span>', '</strong>', '</b>', '</em>', '</i>',
+    '</u>', '</ul>', '</ol>', '</li>', '</table>', '</tr>', '</td>', '</th>',
+]
+# Хвост открывающего тега: до '>' без '<' внутри, как [^<>]* в _HTML_TAG_PATTERNS
+_OPENER_TAIL_RE = re.compile(r'[^<>]*>')
+
+
+def _build_tag_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in _HTML_TAG_OPENERS:
+        automaton.add_word(word, (len(word), True))
+    for word in _HTML_TAG_CLOSERS:
+        automaton.add_word(word, (len(word), False))
+    automaton.make_automaton()
+    return automaton
+
+
+_HTML_TAG_AUTOMATON = _build_tag_automaton()
+
+# В re2 `\s` — только ASCII, а нам нужны и юникодные пробелы (например, NBSP)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _strip_html_tags_once(content: str) -> tuple[str, int]:
+    """Один проход удаления тегов. Возвращает текст и число удалённых тегов."""
+    haystack = content.translate(_TAG_FOLD)
+    if _HTML_TAG_AUTOMATON is None:
+        kept = []
+        pos = 0
+        count = 0
+        for match in _HTML_TAG_RE.finditer(haystack):
+            kept.append(content[pos:match.start()])
+            pos = match.end()
+            count += 1
+        if not count:
+            return content, 0
+        kept.append(content[pos:])
+        return ''.join(kept), count
+
+    kept = []
+    pos = 0  # начало ещё не скопированного текста
+    count = 0
+    # Все слова начинаются с '<' и больше его не содержат, поэтому совпадения идут по возрастанию начала
+    for end, (length, is_opener) in _HTML_TAG_AUTOMATON.iter(haystack):
+        start = end - length + 1
+        if start < pos:
+            # Внутри уже удалённого тега (например, '<b' внутри '<br>')
+            continue
+        if is_opener:
+            tail = _OPENER_TAIL_RE.match(haystack, end + 1)
+            if tail is None:
+                continue
+            end = tail.end() - 1
+        kept.append(content[pos:start])
+        pos = end + 1
+        count += 1
+    kept.append(content[pos:])
+    return ''.join(kept), count
+
+
+def _strip_html_tags(content: str) -> str:
+    """
+    Удаление известных HTML тегов (см. _HTML_TAG_PATTERNS) из текста CDATA.
+    Как и прежнее поочерёдное применение паттернов, удаляет и теги, которые складываются
+    только после удаления других (например, "<<p>b>"): проходы повторяются, пока что-то удаляется.
+    """
+    count = 1
+    while count and '<' in content:
+        content, count = _strip_html_tags_once(content)
+    return content
+
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -71,40 +198,16 @@ def clean_xml_file(xml_content: str) -> str:
     if not xml_content:
         return xml_content
     
-    # Паттерн для поиска CDATA блоков: <![CDATA[ ... ]]>
-    cdata_pattern = r'<!\[CDATA\[(.*?)\]\]>'
-    
     def replace_cdata(match):
         """Функция для замены CDATA на очищенный текст"""
         content = match.group(1)
         
-        # Удаляем HTML теги (например, <p>, </p>, <br/> и т.д.)
+        # Удаляем HTML теги за один проход по строке
         # Но сохраняем символы < и > которые не являются тегами (например, в формулах Excel)
-        # Сначала удаляем известные HTML теги
-        html_tags = [
-            r'<p[^>]*>', r'</p>',
-            r'<br[^>]*/?>',
-            r'<div[^>]*>', r'</div>',
-            r'<span[^>]*>', r'</span>',
-            r'<strong[^>]*>', r'</strong>',
-            r'<b[^>]*>', r'</b>',
-            r'<em[^>]*>', r'</em>',
-            r'<i[^>]*>', r'</i>',
-            r'<u[^>]*>', r'</u>',
-            r'<ul[^>]*>', r'</ul>',
-            r'<ol[^>]*>', r'</ol>',
-            r'<li[^>]*>', r'</li>',
-            r'<table[^>]*>', r'</table>',
-            r'<tr[^>]*>', r'</tr>',
-            r'<td[^>]*>', r'</td>',
-            r'<th[^>]*>', r'</th>',
-        ]
-        
-        for tag_pattern in html_tags:
-            content = re.sub(tag_pattern, '', content, flags=re.IGNORECASE)
+        content = _strip_html_tags(content)
         
         # Убираем лишние пробелы и переносы строк (но сохраняем один пробел)
-        content = re.sub(r'\s+', ' ', content)
+        content = _WHITESPACE_RE.sub(' ', content)
         content = content.strip()
         
         # Экранируем XML-специальные символы (включая < и > которые остались)
@@ -113,29 +216,32 @@ def clean_xml_file(xml_content: str) -> str:
         return content
     
     # Заменяем все CDATA блоки на очищенный текст
-    cleaned_xml = re.sub(cdata_pattern, replace_cdata, xml_content, flags=re.DOTALL)
+    cleaned_xml = _CDATA_RE.sub(replace_cdata, xml_content)
     
     return cleaned_xml
 
 
-def validate_xml_file(xml_file_path: Path) -> Tuple[bool, Optional[str]]:
+class _NullTarget:
+    """Пустой target для XMLParser: только проверка синтаксиса, дерево не строится."""
+
+
+def validate_xml(xml_bytes: bytes) -> Tuple[bool, Optional[str]]:
     """
-    Проверка корректности XML файла перед парсингом
+    Проверка корректности XML, уже прочитанного в память
     
     Args:
-        xml_file_path: Путь к XML файлу
+        xml_bytes: Содержимое XML файла (байты, декодирование выполняет expat)
         
     Returns:
         Кортеж (is_valid, error_message)
-        is_valid: True если файл корректен, False если есть ошибки
+        is_valid: True если XML корректен, False если есть ошибки
         error_message: Сообщение об ошибке с номером строки, или None если ошибок нет
     """
-    if not xml_file_path.exists():
-        return False, f"Файл не найден: {xml_file_path}"
-    
     try:
         # Пытаемся распарсить XML
-        tree = ET.parse(xml_file_path)
+        parser = ET.XMLParser(target=_NullTarget())
+        parser.feed(xml_bytes)
+        parser.close()
         return True, None
     except ET.ParseError as e:
         # Извлекаем информацию об ошибке
@@ -153,3 +259,18 @@ def validate_xml_file(xml_file_path: Path) -> Tuple[bool, Optional[str]]:
     except Exception as e:
         return False, f"Неожиданная ошибка при проверке XML: {str(e)}"
 
+
+def validate_xml_file(xml_file_path: Path) -> Tuple[bool, Optional[str]]:
+    """
+    Проверка корректности XML файла перед парсингом
+    
+    Args:
+        xml_file_path: Путь к XML файлу
+        
+    Returns:
+        Кортеж (is_valid, error_message), см. validate_xml
+    """
+    if not xml_file_path.exists():
+        return False, f"Файл не найден: {xml_file_path}"
+    
+    return validate_xml(xml_file_path.read_bytes())
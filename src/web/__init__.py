@@ -6,6 +6,13 @@ from pathlib import Path
 
 from flask import Flask, session
 
+try:
+    # Flask-Session: данные сессии на сервере вместо подписанной cookie
+    from cachelib.file import FileSystemCache
+    from flask_session import Session
+except ImportError:
+    Session = None
+
 from config import BaseConfig
 from src.web.routes.main import main_bp
 
@@ -26,6 +33,18 @@ def create_app(config_object: type[BaseConfig] = BaseConfig) -> Flask:
         static_folder=str(package_dir / "static"),
     )
     app.config.from_object(config_object)
+    # Разрешённый корень выгрузок: проверка путей при скачивании не делает resolve() на каждый запрос
+    app.config["_OUTPUT_ROOT_RESOLVED"] = Path(app.config["OUTPUT_FOLDER"]).resolve()
+
+    if Session is not None and app.config.get("SESSION_TYPE") == "cachelib":
+        app.config.setdefault(
+            "SESSION_CACHELIB",
+            FileSystemCache(
+                str(app.config["SESSION_FILE_DIR"]),
+                threshold=app.config.get("SESSION_FILE_THRESHOLD", 500),
+            ),
+        )
+        Session(app)
 
     # Регистрация blueprints
     app.register_blueprint(main_bp)
@@ -4,12 +4,20 @@
 
 from __future__ import annotations
 
-import json
+import hashlib
+import multiprocessing
+import os
 import re
+import shutil
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import asdict, dataclass
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import wraps
 from pathlib import Path
-from typing import List
+from typing import Any, List
 from uuid import uuid4
 
 from flask import (
@@ -18,20 +26,30 @@ from flask import (
     abort,
     current_app,
     flash,
+    g,
+    make_response,
     redirect,
     render_template,
     request,
     send_file,
     session,
+    stream_with_context,
     url_for,
 )
 from werkzeug.utils import secure_filename
 
+try:
+    # google-re2: поиск по регулярному выражению пользователя за линейное время
+    import re2
+except ImportError:
+    re2 = None
+
 from src.generators.document_generator import DocumentGenerator
 from src.generators.exporters import ExcelExporter, HTMLExporter, MarkdownExporter, PDFExporter
 from src.models.metadata import DocumentMetadata
 from src.models.question import Question
 from src.parsers.xml_parser import XMLParser
+from src.utils import fastjson
 from src.utils.file_utils import sanitize_filename
 
 from ..forms.export_form import ExportForm
@@ -47,7 +65,8 @@ from src.template_engine.migration import migrate_v1_to_v2
 from src.template_engine.presets import presets_for_type, preset_table_default
 from src.template_engine.render_html import render_document_html, render_question_html
 from src.template_engine.validator import validate_template_config_v2
-from ..utils.storage import load_snapshot, save_snapshot
+from ..utils.pending_writer import pending_writer
+from ..utils.storage import forget_snapshots, load_snapshot, save_snapshot, snapshot_stamp
 
 
 main_bp = Blueprint("main", __name__)
@@ -64,36 +83,75 @@ class UploadMeta:
 
 
 def _get_uploads() -> List[dict]:
-    return session.get("uploads", [])
+    return sm.get_list("uploads")
 
 
 def _append_upload(meta: UploadMeta) -> None:
     uploads = _get_uploads()
     uploads.append(asdict(meta))
-    session["uploads"] = uploads
+    sm.set_list("uploads", uploads)
+    # Набор снапшотов сессии изменился — сбрасываем значения, собранные за запрос
+    g.pop("_all_snapshots", None)
+    g.pop("_combined", None)
 
 
 def _get_exports() -> List[dict]:
-    return session.get("exports", [])
+    """Экспорты сессии, новые первыми."""
+    return sm.get_list("exports")
 
 
 def _append_export(data: dict) -> None:
     exports = _get_exports()
-    exports.append(data)
-    session["exports"] = exports
-    session.modified = True
+    # Новые записи в начало: страницы показывают список как есть, без разворота
+    exports.insert(0, data)
+    sm.set_list("exports", exports)
+
+
+def _snapshots_fingerprint() -> tuple:
+    """Отпечаток данных сессии: ((file_id, (mtime_ns, size)), ...) в порядке загрузки."""
+    return tuple((fid, snapshot_stamp(fid)) for fid in (u.get("id") for u in _get_uploads()) if fid)
+
+
+def _etag_from_snapshots(view):
+    """
+    Условный GET для страниц только для чтения: слабый ETag по снапшотам сессии, теме и URL с параметрами.
+    При совпадении If-None-Match отдаём 304 без рендеринга, поэтому у view не должно быть побочных
+    эффектов в сессии (они не выполнятся). Если есть непоказанные flash-сообщения —
+    всегда рендерим страницу, иначе сообщения потеряются.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get("_flashes"):
+            return view(*args, **kwargs)
+        key = repr((_snapshots_fingerprint(), session.get("theme", "light"), request.full_path))
+        etag = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return wrapper
+
+
+@main_bp.after_app_request
+def _flush_history(response):
+    # Записи журнала за запрос сохраняются в сессию одним изменением
+    history.flush()
+    return response
 
 
 @main_bp.route("/", methods=["GET"])
 def index():
-    snapshots = _all_snapshots()
     uploads = _get_uploads()
     exports = _get_exports()
 
-    combined = {
-        "questions": [q for s in snapshots for q in (s.get("questions") or [])],
-        "courses": [c for s in snapshots for c in (s.get("courses") or [])],
-    }
+    combined = _combined_snapshot_cached()
     stats = stats_utils.overall_stats(combined, uploads)
     stats["generated_reports"] = len(exports)
     stats["total_uploads"] = len(uploads)
@@ -110,6 +168,8 @@ def upload():
         processed: list[str] = []
         failed: list[str] = []
 
+        # Сначала сохраняем все файлы, затем парсим их (при нескольких файлах — параллельно)
+        saved: list[tuple[str, str, str, Path]] = []
         for file in files:
             file_id = str(uuid4())
             original_name = (getattr(file, "filename", None) or "").strip() or "questions.xml"
@@ -118,12 +178,34 @@ def upload():
             upload_path = Path(current_app.config["UPLOAD_FOLDER"]) / stored_name
             upload_path.parent.mkdir(parents=True, exist_ok=True)
 
+            # Быстрая проверка по началу файла: пустые и не-XML файлы не пишем на диск и не парсим
+            head = file.stream.read(_XML_HEAD_SIZE)
+            if not _looks_like_xml(head):
+                flash(f"Файл {original_name} пропущен: это не XML.", "warning")
+                failed.append(original_name)
+                continue
+
+            tmp_path = upload_path.with_name(f"{stored_name}.part")
+
             try:
-                file.save(upload_path)
-                parser = XMLParser(str(upload_path))
-                courses = parser.parse_courses()
+                # Копируем поток крупными блоками во временный файл и атомарно переименовываем
+                with open(tmp_path, "wb") as dst:
+                    dst.write(head)
+                    shutil.copyfileobj(file.stream, dst, length=1 << 20)
+                os.replace(tmp_path, upload_path)
             except Exception:  # pylint: disable=broad-except
-                current_app.logger.exception("Ошибка при парсинге XML файла")
+                current_app.logger.exception("Ошибка при сохранении XML файла")
+                tmp_path.unlink(missing_ok=True)
+                upload_path.unlink(missing_ok=True)
+                failed.append(original_name)
+                continue
+            saved.append((file_id, original_name, stored_name, upload_path))
+
+        parsed = _parse_upload_files([str(item[3]) for item in saved])
+
+        for (file_id, original_name, stored_name, upload_path), courses in zip(saved, parsed):
+            if isinstance(courses, Exception):
+                current_app.logger.error("Ошибка при парсинге XML файла", exc_info=courses)
                 upload_path.unlink(missing_ok=True)
                 failed.append(original_name)
                 continue
@@ -133,30 +215,30 @@ def upload():
 
             for course_index, course in enumerate(courses):
                 course_name = course.name or f"Курс {course_index + 1}"
-                questions_payload = []
-
-                for question_index, question in enumerate(course.questions):
-                    question_dict = question.to_dict()
-                    question_id = f"{file_id}:{course_index}:{question_index}"
-                    payload = {
-                        "id": question_id,
-                        "course_id": f"{file_id}:{course_index}",
+                course_id = f"{file_id}:{course_index}"
+                # Поля берём прямо из dataclass, без промежуточного to_dict()
+                questions_payload = [
+                    {
+                        "id": f"{course_id}:{question_index}",
+                        "course_id": course_id,
                         "course_name": course_name,
-                        "type": question_dict.get("type", ""),
-                        "name": question_dict.get("name", "") or f"Вопрос {question_index + 1}",
-                        "question_text": question_dict.get("question_text", ""),
-                        "reference_answer": question_dict.get("reference_answer", ""),
-                        "answers": question_dict.get("answers", []),
-                        "correct_answers": question_dict.get("correct_answers", []),
-                        "matching_items": question_dict.get("matching_items", []),
-                        "matching_answers": question_dict.get("matching_answers", []),
+                        "file_name": original_name,
+                        "type": question.type,
+                        "name": question.name or f"Вопрос {question_index + 1}",
+                        "question_text": question.question_text,
+                        "reference_answer": question.reference_answer,
+                        "answers": question.answers,
+                        "correct_answers": question.correct_answers,
+                        "matching_items": question.matching_items,
+                        "matching_answers": question.matching_answers,
                     }
-                    questions_payload.append(payload)
-                    all_questions.append(payload)
+                    for question_index, question in enumerate(course.questions)
+                ]
+                all_questions.extend(questions_payload)
 
                 courses_payload.append(
                     {
-                        "id": f"{file_id}:{course_index}",
+                        "id": course_id,
                         "name": course_name,
                         "question_count": len(questions_payload),
                         "questions": questions_payload,
@@ -211,12 +293,88 @@ def upload():
     return render_template("upload.html", form=form, uploads=uploads)
 
 
+_XML_HEAD_SIZE = 4096
+
+
+def _looks_like_xml(head: bytes) -> bool:
+    """Начало файла похоже на XML-выгрузку Moodle: объявление <?xml или корневой <quiz> в первых 4 КБ."""
+    head = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    return head.startswith(b"<?xml") or b"<quiz" in head
+
+
+def _parse_courses_worker(path: str) -> list:
+    """Парсит один XML файл; вызывается в том числе в дочернем процессе (Course/Question — picklable dataclass)."""
+    return XMLParser(path).parse_courses()
+
+
+# Пул процессов для парсинга создаётся один раз на процесс сервера, при первой загрузке нескольких файлов.
+# Контекст spawn, а не fork: форк многопоточного сервера копирует захваченные другими потоками
+# блокировки (таймер PendingWriter, _WRITE_LOCK хранилища шаблонов), и дочерний процесс может зависнуть.
+_PARSE_POOL: ProcessPoolExecutor | None = None
+_PARSE_POOL_LOCK = threading.Lock()
+
+
+def _parse_pool() -> ProcessPoolExecutor:
+    global _PARSE_POOL  # pylint: disable=global-statement
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            _PARSE_POOL = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _PARSE_POOL
+
+
+def _reset_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """Сломанный пул (дочерний процесс упал) заменяется новым при следующей загрузке."""
+    global _PARSE_POOL  # pylint: disable=global-statement
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is pool:
+            _PARSE_POOL = None
+    pool.shutdown(wait=False)
+
+
+def _parse_upload_files(paths: list[str]) -> list:
+    """
+    Парсит загруженные файлы, сохраняя порядок.
+    Для каждого файла возвращает список курсов либо исключение, возникшее при его разборе.
+    """
+    if len(paths) <= 1:
+        results: list = []
+        for path in paths:
+            try:
+                results.append(_parse_courses_worker(path))
+            except Exception as exc:  # pylint: disable=broad-except
+                results.append(exc)
+        return results
+
+    # Парсинг упирается в CPU, поэтому несколько файлов разбираем в отдельных процессах
+    pool = _parse_pool()
+    try:
+        futures = [pool.submit(_parse_courses_worker, path) for path in paths]
+    except BrokenProcessPool:
+        _reset_parse_pool(pool)
+        pool = _parse_pool()
+        futures = [pool.submit(_parse_courses_worker, path) for path in paths]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except BrokenProcessPool as exc:
+            _reset_parse_pool(pool)
+            results.append(exc)
+        except Exception as exc:  # pylint: disable=broad-except
+            results.append(exc)
+    return results
+
+
 @main_bp.get("/files")
+@_etag_from_snapshots
 def files_history():
     uploads = list(reversed(_get_uploads()))
     return render_template("files_history.html", uploads=uploads)
 
 
+# Без _etag_from_snapshots: просмотр переключает текущий файл сессии, а 304 пропустил бы это
 @main_bp.get("/parse_results/<file_id>")
 def parse_results(file_id: str):
     snapshot = load_snapshot(file_id)
@@ -235,6 +393,53 @@ QUESTION_TYPE_LABELS = {
     "truefalse": "Верно/Неверно",
 }
 
+# Примеры вопросов по типам для предпросмотра шаблонов (создаются один раз)
+SAMPLE_BY_TYPE = {
+    "essay_gigachat": Question(
+        type="essay_gigachat",
+        question_text="Опишите принцип работы TCP.",
+        reference_answer="TCP — протокол транспортного уровня с установлением соединения.",
+        name="sample_essay",
+    ),
+    "shortanswer": Question(
+        type="shortanswer",
+        question_text="Столица Франции?",
+        reference_answer="Париж",
+        name="sample_short",
+        correct_answers=["Париж"],
+    ),
+    "multichoice": Question(
+        type="multichoice",
+        question_text="Выберите простые числа.",
+        reference_answer="",
+        name="sample_multi",
+        answers=["2", "3", "4"],
+        correct_answers=["2", "3"],
+    ),
+    "matching": Question(
+        type="matching",
+        question_text="Сопоставьте термин и определение.",
+        reference_answer="",
+        name="sample_match",
+        matching_items=[
+            {"item": "CPU", "answer": "Центральный процессор"},
+            {"item": "RAM", "answer": "Оперативная память"},
+        ],
+        matching_answers=["Оперативная память", "Центральный процессор"],
+    ),
+    "truefalse": Question(
+        type="truefalse",
+        question_text="HTTP — протокол прикладного уровня.",
+        reference_answer="",
+        name="sample_tf",
+        answers=["Верно", "Неверно"],
+        correct_answers=["Верно"],
+    ),
+}
+
+# Пресеты по умолчанию для всех типов (предпросмотр v2); общий объект, только для чтения
+_ALL_TEMPLATES = {t: preset_table_default(t) for t in QUESTION_TYPE_LABELS}
+
 
 def _ensure_snapshot():
     snapshot = sm.get_snapshot()
@@ -247,8 +452,12 @@ def _ensure_snapshot():
 def _all_snapshots() -> list[dict]:
     """
     Возвращает список снапшотов по всем загруженным файлам в текущей сессии.
+    Собирается один раз на запрос (flask.g).
     """
-    snapshots: list[dict] = []
+    snapshots = g.get("_all_snapshots")
+    if snapshots is not None:
+        return snapshots
+    snapshots = []
     for u in _get_uploads():
         fid = u.get("id")
         if not fid:
@@ -256,15 +465,38 @@ def _all_snapshots() -> list[dict]:
         s = load_snapshot(fid)
         if s:
             snapshots.append(s)
+    g._all_snapshots = snapshots
     return snapshots
 
 
-def _combined_snapshot() -> dict:
-    snapshots = _all_snapshots()
-    return {
-        "questions": [q for s in snapshots for q in (s.get("questions") or [])],
-        "courses": [c for s in snapshots for c in (s.get("courses") or [])],
-    }
+# Объединённые снапшоты между запросами: _snapshots_fingerprint() -> combined
+_COMBINED_CACHE: dict[tuple, dict] = {}
+_COMBINED_CACHE_SIZE = 32
+
+
+def _combined_snapshot_cached() -> dict:
+    """
+    Объединённые вопросы и курсы всех загрузок сессии.
+    Собирается один раз на запрос (flask.g) и переиспользуется, пока не изменились файлы снапшотов.
+    Результат общий — изменять его нельзя.
+    """
+    combined = g.get("_combined")
+    if combined is not None:
+        return combined
+    fingerprint = _snapshots_fingerprint()
+    combined = _COMBINED_CACHE.get(fingerprint)
+    if combined is None:
+        snapshots = _all_snapshots()
+        combined = {
+            "questions": [q for s in snapshots for q in (s.get("questions") or [])],
+            "courses": [c for s in snapshots for c in (s.get("courses") or [])],
+            "_snapshots": snapshots,
+        }
+        if len(_COMBINED_CACHE) >= _COMBINED_CACHE_SIZE:
+            _COMBINED_CACHE.pop(next(iter(_COMBINED_CACHE)))
+        _COMBINED_CACHE[fingerprint] = combined
+    g._combined = combined
+    return combined
 
 
 def _find_course_any(course_id: str) -> dict | None:
@@ -275,33 +507,28 @@ def _find_course_any(course_id: str) -> dict | None:
     if file_id:
         snapshot = load_snapshot(file_id)
         if snapshot:
-            found = next((c for c in snapshot.get("courses", []) if c.get("id") == course_id), None)
+            found = snapshot["_course_by_id"].get(course_id)
             if found:
                 return found
     # fallback: search all
     for s in _all_snapshots():
-        found = next((c for c in s.get("courses", []) if c.get("id") == course_id), None)
+        found = s["_course_by_id"].get(course_id)
         if found:
             return found
     return None
 
 
 @main_bp.get("/questions")
+@_etag_from_snapshots
 def questions():
-    snapshots = _all_snapshots()
-    if not snapshots:
+    combined = _combined_snapshot_cached()
+    if not combined["_snapshots"]:
         flash("Сначала загрузите XML файл для обработки.", "error")
         return redirect(url_for("main.upload"))
 
-    questions_data: list[dict] = []
-    courses: list[dict] = []
-    for s in snapshots:
-        file_name = s.get("original_name", "")
-        for q in s.get("questions", []) or []:
-            q2 = dict(q)
-            q2["file_name"] = file_name
-            questions_data.append(q2)
-        courses.extend(s.get("courses", []) or [])
+    # file_name уже лежит в каждом вопросе снапшота, копировать не нужно
+    questions_data = combined["questions"]
+    courses = combined["courses"]
 
     filter_type = request.args.get("type", "")
     filter_course = request.args.get("course", "")
@@ -309,27 +536,35 @@ def questions():
     use_regex = request.args.get("regex", "0") == "1"
     has_answers = request.args.get("has_answers", "")
 
-    filtered = questions_data
+    # Активные фильтры: (индекс, вопрос) -> bool; применяются за один проход
+    checks = []
     if filter_type:
-        filtered = [q for q in filtered if q["type"] == filter_type]
+        checks.append(lambda i, q: q["type"] == filter_type)
     if filter_course:
-        filtered = [q for q in filtered if q["course_id"] == filter_course]
+        checks.append(lambda i, q: q["course_id"] == filter_course)
     if has_answers == "1":
-        filtered = [q for q in filtered if q.get("answers")]
+        checks.append(lambda i, q: q.get("answers"))
     if search:
         if use_regex:
             try:
-                pattern = re.compile(search, re.IGNORECASE)
-                filtered = [
-                    q for q in filtered if pattern.search(q["name"]) or pattern.search(q["question_text"])
-                ]
+                match = _compile_search(search)
             except re.error:
                 flash("Некорректное регулярное выражение.", "error")
+            else:
+                checks.append(lambda i, q: match(q["name"]) or match(q["question_text"]))
         else:
             lowered = search.lower()
-            filtered = [
-                q for q in filtered if lowered in q["name"].lower() or lowered in q["question_text"].lower()
-            ]
+            names_lower = combined.get("_names_lower")
+            if names_lower is None:
+                names_lower = combined["_names_lower"] = [q["name"].lower() for q in questions_data]
+                combined["_texts_lower"] = [q["question_text"].lower() for q in questions_data]
+            texts_lower = combined["_texts_lower"]
+            checks.append(lambda i, q: lowered in names_lower[i] or lowered in texts_lower[i])
+
+    if checks:
+        filtered = [q for i, q in enumerate(questions_data) if all(check(i, q) for check in checks)]
+    else:
+        filtered = questions_data
 
     return render_template(
         "questions.html",
@@ -386,8 +621,8 @@ def question_edit(question_id: str):
         form.type.data = question["type"]
         form.question_text.data = question["question_text"]
         form.reference_answer.data = question.get("reference_answer", "")
-        form.answers.data = "\n".join(question.get("answers", []))
-        form.correct_answers.data = "\n".join(question.get("correct_answers", []))
+        form.answers.data = _lines_text(question, "answers")
+        form.correct_answers.data = _lines_text(question, "correct_answers")
 
     if form.validate_on_submit():
         updated = {
@@ -429,7 +664,7 @@ def question_create():
 
     if form.validate_on_submit():
         course_id = form.course_id.data
-        course = next((c for c in snapshot.get("courses", []) if c["id"] == course_id), None)
+        course = snapshot["_course_by_id"].get(course_id)
         if not course:
             flash("Выбранный курс не найден.", "error")
             return redirect(url_for("main.questions"))
@@ -440,6 +675,7 @@ def question_create():
             "id": question_id,
             "course_id": course_id,
             "course_name": course["name"],
+            "file_name": snapshot.get("original_name", ""),
             "type": form.type.data,
             "name": form.name.data.strip(),
             "question_text": form.question_text.data.strip(),
@@ -481,11 +717,13 @@ def question_preview(question_id: str):
 
 
 @main_bp.get("/courses")
+@_etag_from_snapshots
 def courses():
-    combined = _combined_snapshot()
-    courses_data = combined.get("courses", [])
-    for course in courses_data:
-        course["type_stats"] = _type_stats(course.get("questions", []))
+    combined = _combined_snapshot_cached()
+    # Копии, чтобы не дописывать type_stats в закешированные снапшоты; сам счётчик кешируется в курсе
+    courses_data = [
+        {**course, "type_stats": stats_utils.type_counter(course)} for course in combined.get("courses", [])
+    ]
 
     return render_template(
         "courses.html",
@@ -496,6 +734,7 @@ def courses():
 
 
 @main_bp.get("/courses/<course_id>")
+@_etag_from_snapshots
 def course_detail(course_id: str):
     course = _find_course_any(course_id)
     if not course:
@@ -507,15 +746,16 @@ def course_detail(course_id: str):
         "course_detail.html",
         course=course,
         questions=questions,
-        type_stats=_type_stats(questions),
+        type_stats=stats_utils.type_counter(course),
         type_labels=QUESTION_TYPE_LABELS,
     )
 
 
 @main_bp.get("/categories")
+@_etag_from_snapshots
 def categories():
     categories_payload = []
-    for course in (_combined_snapshot().get("courses", []) or []):
+    for course in (_combined_snapshot_cached().get("courses", []) or []):
         categories_payload.append(
             {
                 "path": f"$module$/top/Оценочные материалы/{course['name']}",
@@ -529,14 +769,16 @@ def categories():
 
 @main_bp.route("/templates", methods=["GET", "POST"])
 def templates_list():
+    # Отпечаток снимаем до чтения, чтобы не закешировать новые данные под старым ключом
+    store_fingerprint = template_storage.fingerprint()
     templates = template_storage.list_templates()
     import_form = TemplateImportForm()
     delete_form = DeleteForm()
 
     if import_form.validate_on_submit():
         try:
-            payload = json.loads(import_form.payload.data)
-        except json.JSONDecodeError:
+            payload = fastjson.loads(import_form.payload.data)
+        except fastjson.JSONDecodeError:
             flash("Некорректный JSON. Проверьте синтаксис.", "error")
         else:
             template_storage.import_template(payload)
@@ -547,13 +789,25 @@ def templates_list():
     return render_template(
         "templates_list.html",
         templates=templates,
-        template_sets=_group_templates_by_name(templates),
+        template_sets=_template_sets(store_fingerprint, templates),
         import_form=import_form,
         delete_form=delete_form,
         question_types=QUESTION_TYPE_LABELS,
     )
 
 
+# Группировка шаблонов для последнего состояния хранилища: fingerprint -> sets
+_TEMPLATE_SETS_CACHE: dict[tuple, list[dict]] = {}
+
+
+def _template_sets(store_fingerprint: tuple, templates: list[dict]) -> list[dict]:
+    sets = _TEMPLATE_SETS_CACHE.get(store_fingerprint)
+    if sets is None:
+        _TEMPLATE_SETS_CACHE.clear()
+        sets = _TEMPLATE_SETS_CACHE[store_fingerprint] = _group_templates_by_name(templates)
+    return sets
+
+
 def _group_templates_by_name(templates: list[dict]) -> list[dict]:
     grouped: dict[str, list[dict]] = {}
     for tpl in templates:
@@ -573,7 +827,7 @@ def template_create():
     if not form.is_submitted():
         # MVP1: стартуем с v2 preset (таблица/список), но оставляем поддержку старого v1.
         try:
-            form.config.data = json.dumps(preset_table_default(form.type.data), ensure_ascii=False, indent=2)
+            form.config.data = fastjson.dumps(preset_table_default(form.type.data), indent=True)
         except Exception:
             form.config.data = "{}"
     if form.validate_on_submit():
@@ -582,7 +836,7 @@ def template_create():
         else:
             schema_version = None
             try:
-                parsed = json.loads(form.config.data.strip() or "{}")
+                parsed = template_storage.parsed_config(form.config.data.strip() or "{}")
                 schema_version = parsed.get("version")
             except Exception:
                 pass
@@ -623,7 +877,7 @@ def template_edit(template_id: str):
         # Если шаблон создан раньше и config пустой — подставим дефолт.
         if form.config.data.strip() in {"", "{}", "null"}:
             try:
-                form.config.data = json.dumps(preset_table_default(form.type.data), ensure_ascii=False, indent=2)
+                form.config.data = fastjson.dumps(preset_table_default(form.type.data), indent=True)
             except Exception:
                 form.config.data = "{}"
 
@@ -633,7 +887,7 @@ def template_edit(template_id: str):
         else:
             schema_version = None
             try:
-                parsed = json.loads(form.config.data.strip() or "{}")
+                parsed = template_storage.parsed_config(form.config.data.strip() or "{}")
                 schema_version = parsed.get("version")
             except Exception:
                 pass
@@ -668,6 +922,11 @@ def _get_preview_questions() -> list[dict]:
     return (snapshot.get("questions") or [])[:200]
 
 
+# HTML предпросмотра шаблонов: blake2b(тип, режим, конфиг, вопрос) -> HTML, вытеснение LRU
+_PREVIEW_CACHE: OrderedDict[str, str] = OrderedDict()
+_PREVIEW_CACHE_SIZE = 128
+
+
 @main_bp.post("/templates/preview")
 def template_preview():
     """
@@ -684,8 +943,8 @@ def template_preview():
     config_raw = payload.get("config")
     if isinstance(config_raw, str):
         try:
-            config = json.loads(config_raw) if config_raw.strip() else {}
-        except json.JSONDecodeError:
+            config = fastjson.loads(config_raw) if config_raw.strip() else {}
+        except fastjson.JSONDecodeError:
             return Response("Invalid template config JSON", status=400, mimetype="text/plain")
     elif isinstance(config_raw, dict):
         config = config_raw
@@ -707,51 +966,38 @@ def template_preview():
         if errors:
             return Response("Template invalid: " + "; ".join(errors), status=400, mimetype="text/plain")
 
-    # Sample question per type
-    sample_by_type = {
-        "essay_gigachat": Question(
-            type="essay_gigachat",
-            question_text="Опишите принцип работы TCP.",
-            reference_answer="TCP — протокол транспортного уровня с установлением соединения.",
-            name="sample_essay",
-        ),
-        "shortanswer": Question(
-            type="shortanswer",
-            question_text="Столица Франции?",
-            reference_answer="Париж",
-            name="sample_short",
-            correct_answers=["Париж"],
-        ),
-        "multichoice": Question(
-            type="multichoice",
-            question_text="Выберите простые числа.",
-            reference_answer="",
-            name="sample_multi",
-            answers=["2", "3", "4"],
-            correct_answers=["2", "3"],
-        ),
-        "matching": Question(
-            type="matching",
-            question_text="Сопоставьте термин и определение.",
-            reference_answer="",
-            name="sample_match",
-            matching_items=[
-                {"item": "CPU", "answer": "Центральный процессор"},
-                {"item": "RAM", "answer": "Оперативная память"},
-            ],
-            matching_answers=["Оперативная память", "Центральный процессор"],
-        ),
-        "truefalse": Question(
-            type="truefalse",
-            question_text="HTTP — протокол прикладного уровня.",
-            reference_answer="",
-            name="sample_tf",
-            answers=["Верно", "Неверно"],
-            correct_answers=["Верно"],
-        ),
-    }
+    # Повторный предпросмотр того же шаблона на том же вопросе отдаём из кеша
+    cache_key = hashlib.blake2b(
+        fastjson.dumps([q_type, mode, config, selected_question], sort_keys=True).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    html_text = _PREVIEW_CACHE.get(cache_key)
+    if html_text is None:
+        html_text = _render_template_preview(q_type, mode, config, selected_question)
+        _PREVIEW_CACHE[cache_key] = html_text
+        if len(_PREVIEW_CACHE) > _PREVIEW_CACHE_SIZE:
+            _PREVIEW_CACHE.popitem(last=False)
+    else:
+        _PREVIEW_CACHE.move_to_end(cache_key)
+    return Response(html_text, mimetype="text/html")
 
-    sample = sample_by_type.get(q_type) or next(iter(sample_by_type.values()))
+
+def _v2_to_v1_min(cfg2: dict, qt: str) -> dict:
+    """Минимальный v1-конфиг из v2 для HTMLExporter: стили и ширины колонок первого table блока."""
+    v1 = {"version": 1, "styles": {}, "layout": {}}
+    if isinstance(cfg2.get("styles"), dict):
+        v1["styles"] = cfg2["styles"]
+    # берём ширины из первого table блока, если есть
+    table = next((b for b in cfg2.get("blocks") or [] if isinstance(b, dict) and b.get("kind") == "table"), None)
+    widths = table.get("col_widths_pct") if table is not None else None
+    if isinstance(widths, list) and widths and all(isinstance(x, int) for x in widths) and qt:
+        v1["layout"][qt] = {"table_cols_pct": widths}
+    return v1
+
+
+def _render_template_preview(q_type: str, mode: str, config: dict, selected_question: dict | None) -> str:
+    """HTML предпросмотра шаблона: v2-движок (mode="v2") или как реальный экспорт HTMLExporter."""
+    sample = SAMPLE_BY_TYPE.get(q_type) or next(iter(SAMPLE_BY_TYPE.values()))
     question_dict = selected_question or sample.to_dict()
     question_dict.setdefault("type", q_type)
     metadata = DocumentMetadata(
@@ -765,40 +1011,16 @@ def template_preview():
 
     if mode == "v2":
         # v2 blocks
-        templates_by_type = {t: preset_table_default(t) for t in QUESTION_TYPE_LABELS.keys()}
-        if q_type:
-            templates_by_type[q_type] = config
-        html_text = render_document_html(
+        templates_by_type = {**_ALL_TEMPLATES, q_type: config} if q_type else _ALL_TEMPLATES
+        return render_document_html(
             questions=[question_dict],
             metadata=metadata.to_dict() | {"document_title": metadata.document_title},
             templates_by_type=templates_by_type,
             title="Предпросмотр шаблона",
         )
-        return Response(html_text, mimetype="text/html")
 
     # export_html: как реальный экспорт HTMLExporter (как в output/*.html)
     # Поддерживаем v1 конфиги (styles/layout) и best-effort v2->v1 (styles + table widths).
-    def _v2_to_v1_min(cfg2: dict, qt: str) -> dict:
-        v1 = {"version": 1, "styles": {}, "layout": {}}
-        if isinstance(cfg2.get("styles"), dict):
-            v1["styles"] = cfg2["styles"]
-        # берём ширины из первого table блока, если есть
-        widths = None
-        for b in cfg2.get("blocks") or []:
-            if isinstance(b, dict) and b.get("kind") == "table":
-                w = b.get("col_widths_pct")
-                if isinstance(w, list) and all(isinstance(x, int) for x in w):
-                    widths = w
-                break
-        if widths and qt:
-            v1["layout"][qt] = {"table_cols_pct": widths}
-        return v1
-
-    try:
-        from src.generators.exporters.html_exporter import HTMLExporter  # local import to avoid circulars
-    except Exception:
-        return Response("HTML exporter unavailable", status=500, mimetype="text/plain")
-
     q_obj = sample
     if selected_question:
         try:
@@ -808,14 +1030,13 @@ def template_preview():
 
     tpl_map = None
     if q_type and isinstance(config, dict):
-        cfg_for_type = config
-        if cfg_for_type.get("version") == 2:
-            cfg_for_type = _v2_to_v1_min(cfg_for_type, q_type)
+        # v1-конфиг передаём как есть, конвертируем только v2
+        cfg_for_type = config if config.get("version") != 2 else _v2_to_v1_min(config, q_type)
         tpl_map = {q_type: cfg_for_type}
 
     exporter = HTMLExporter()
     html_text, _meta = exporter.render_html([q_obj], metadata, template_map=tpl_map)
-    return Response(html_text, mimetype="text/html")
+    return html_text
 
 
 @main_bp.post("/templates/<template_id>/delete")
@@ -835,7 +1056,7 @@ def template_export(template_id: str):
     if not template:
         flash("Шаблон не найден.", "error")
         return redirect(url_for("main.templates_list"))
-    response = Response(json.dumps(template, ensure_ascii=False, indent=2), mimetype="application/json")
+    response = Response(fastjson.dumps(template_storage.public_view(template), indent=True), mimetype="application/json")
     response.headers["Content-Disposition"] = f"attachment; filename=template_{template_id}.json"
     return response
 
@@ -848,9 +1069,154 @@ EXPORTER_CLASSES = {
 }
 
 
+def _export_course(
+    course: dict,
+    options: dict[str, str],
+    all_templates: list[dict],
+    output_folder: Path,
+    output_stem: str,
+    logger: Any,
+) -> tuple[dict | None, list[tuple[str, str]], list[tuple[str, str]]]:
+    """
+    Экспорт одного курса; выполняется в рабочем потоке, поэтому не трогает flash/session.
+
+    Returns:
+        (запись экспорта или None, сообщения для flash, записи для истории)
+    """
+    messages: list[tuple[str, str]] = []
+    history_entries: list[tuple[str, str]] = []
+    questions_raw = course.get("questions", [])
+    if not questions_raw:
+        return None, messages, history_entries
+    questions = [Question.from_dict(q) for q in questions_raw]
+    metadata = DocumentMetadata(
+        pk_prefix=options["pk_prefix"],
+        pk_id=options["pk_id"],
+        ipk_prefix=options["ipk_prefix"],
+        ipk_id=options["ipk_id"],
+        description=options["description"],
+        document_title=course["name"],
+    )
+
+    format_choice = options["format"]
+    # Расширения файлов для выгрузки (не всегда совпадает с ключом формата в UI).
+    # Например: формат "excel" экспортируется как .xlsx.
+    format_ext = {
+        "excel": "xlsx",
+    }.get(format_choice, format_choice)
+    output_path = output_folder / f"{output_stem}.{format_ext}"
+
+    generated_successfully = False
+
+    # Пытаемся применить выбранный набор шаблонов (если не "standard")
+    template_map = None
+    selected_set_name = options["template_name"]
+    selected_cfg_by_type: dict[str, dict] = {}
+    if selected_set_name and selected_set_name != "standard":
+        matching = [t for t in all_templates if (t.get("name") or "").strip() == selected_set_name]
+        for tpl in matching:
+            # config разобран один раз при загрузке хранилища
+            cfg = tpl.get("_config_parsed") or {}
+            if cfg and tpl.get("type"):
+                selected_cfg_by_type[str(tpl.get("type"))] = cfg
+
+        # Если в наборе есть только один тип (legacy), применяем его ко всем типам в курсе
+        if len(selected_cfg_by_type) == 1:
+            only_cfg = next(iter(selected_cfg_by_type.values()))
+            course_types = sorted({(q.get("type") or "") for q in questions_raw if q.get("type")})
+            selected_cfg_by_type = {t: only_cfg for t in course_types}
+
+        if selected_cfg_by_type:
+            template_map = selected_cfg_by_type
+
+    # MVP1: если HTML и v2-шаблон — используем новый движок с блоками.
+    # Для HTML поддерживаем v2-конфиги по каждому типу.
+    v2_cfg_by_type = {
+        t: cfg for t, cfg in selected_cfg_by_type.items() if isinstance(cfg, dict) and cfg.get("version") == 2
+    }
+    if format_choice == "html" and v2_cfg_by_type:
+        # Типы курса в порядке появления (стили документа берутся из первого конфига):
+        # выбранный v2-конфиг, иначе дефолтный пресет
+        course_types = dict.fromkeys(q.get("type") for q in questions_raw)
+        templates_by_type = {t: v2_cfg_by_type.get(t) or preset_table_default(t) for t in course_types if t}
+        templates_by_type.update((t, cfg) for t, cfg in v2_cfg_by_type.items() if t not in templates_by_type)
+        html_text = render_document_html(
+            questions=questions_raw,
+            metadata=metadata.to_dict() | {"document_title": metadata.document_title},
+            templates_by_type=templates_by_type,
+            title=course["name"],
+        )
+        output_path.write_text(html_text, encoding="utf-8")
+        generated_successfully = True
+    elif format_choice == "docx":
+        generator = DocumentGenerator(metadata)
+        try:
+            result = generator.generate(questions, str(output_path), template_map=template_map)
+            generated_successfully = True
+            skipped = result.get("skipped_types") or {}
+            if skipped:
+                skipped_msg = ", ".join(f"{k}: {v}" for k, v in skipped.items())
+                messages.append((
+                    f"Часть вопросов пропущена (нет шаблона): {skipped_msg}",
+                    "warning",
+                ))
+            errs = result.get("errors") or []
+            if errs:
+                messages.append((
+                    f"Сформирован документ, но с ошибками рендеринга: {len(errs)}",
+                    "warning",
+                ))
+        except Exception as e:
+            logger.exception("DOCX export failed for course=%s", course.get("name"))
+            history_entries.append(("Export failed", f"DOCX: {course.get('name', '')}: {e}"))
+            messages.append((f"Ошибка экспорта DOCX для курса '{course['name']}': {e}", "error"))
+            return None, messages, history_entries
+    else:
+        exporter = EXPORTER_CLASSES.get(format_choice)
+        if exporter:
+            try:
+                exporter.export(questions, metadata, str(output_path), template_map=template_map)
+                generated_successfully = True
+            except NotImplementedError:
+                messages.append((
+                    f"Экспорт в формат {format_choice.upper()} пока недоступен, используйте DOCX.",
+                    "info",
+                ))
+                return None, messages, history_entries
+            except Exception as e:
+                logger.exception(
+                    "Export failed: format=%s course=%s", format_choice, course.get("name")
+                )
+                history_entries.append((
+                    "Export failed",
+                    f"{format_choice.upper()}: {course.get('name', '')}: {e}",
+                ))
+                messages.append((
+                    f"Ошибка экспорта {format_choice.upper()} для курса '{course['name']}': {e}",
+                    "error",
+                ))
+                return None, messages, history_entries
+        else:
+            messages.append((f"Неизвестный формат {format_choice}.", "error"))
+            return None, messages, history_entries
+
+    if not generated_successfully:
+        return None, messages, history_entries
+
+    record = {
+        "id": str(uuid4()),
+        "course_name": course["name"],
+        "format": format_choice,
+        "filename": output_path.name,
+        "path": str(output_path),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    return record, messages, history_entries
+
+
 @main_bp.route("/export", methods=["GET", "POST"])
 def export():
-    combined = _combined_snapshot()
+    combined = _combined_snapshot_cached()
     courses = combined.get("courses", [])
     form = ExportForm()
     form.courses.choices = [(course["id"], course["name"]) for course in courses]
@@ -859,25 +1225,10 @@ def export():
 
     # Шаблоны выбираются как "набор" по имени: один выбор -> несколько конфигов по типам.
     # Это позволяет применять набор шаблонов ко всем типам вопросов в одном файле.
+    store_fingerprint = template_storage.fingerprint()
     all_templates = template_storage.list_templates()
-    sets: dict[str, set[str]] = {}
-    for tpl in all_templates:
-        name = (tpl.get("name") or "").strip() or "Без названия"
-        t = (tpl.get("type") or "").strip()
-        sets.setdefault(name, set())
-        if t:
-            sets[name].add(t)
-    template_choices = [("standard", "Стандартный")]
-    for name in sorted(sets.keys(), key=lambda s: s.lower()):
-        types = sorted(sets[name])
-        label = name if not types else f"{name} (типов: {len(types)})"
-        template_choices.append((name, label))
-    form.template_name.choices = template_choices
-
-    metadata_templates = metadata_storage.list_templates()
-    form.metadata_template.choices = [("", "Без шаблона")] + [
-        (tpl["id"], tpl["name"]) for tpl in metadata_templates
-    ]
+    form.template_name.choices = _template_choices(store_fingerprint, all_templates)
+    form.metadata_template.choices = _metadata_choices()
 
     if not courses:
         flash("Нет курсов для экспорта. Загрузите файл.", "error")
@@ -899,7 +1250,7 @@ def export():
             "export.html",
             form=form,
             courses=courses,
-            exports=list(reversed(_get_exports())),
+            exports=_get_exports(),
         )
 
     if form.validate_on_submit():
@@ -910,142 +1261,44 @@ def export():
             flash("Выберите хотя бы один курс.", "error")
         else:
             generated = []
+            options = {
+                "pk_prefix": form.pk_prefix.data.strip(),
+                "pk_id": form.pk_id.data.strip(),
+                "ipk_prefix": form.ipk_prefix.data.strip(),
+                "ipk_id": form.ipk_id.data.strip(),
+                "description": form.description.data.strip(),
+                "format": form.format.data,
+                "template_name": (form.template_name.data or "").strip(),
+            }
+            output_folder = Path(current_app.config["OUTPUT_FOLDER"])
+            output_folder.mkdir(parents=True, exist_ok=True)
+            # Одна метка времени на всю выгрузку; одноимённые курсы получают суффикс,
+            # чтобы параллельные потоки не писали в один файл
+            timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+            stem_counts: Counter = Counter()
+            output_stems = []
             for course in selected_courses:
-                questions_raw = course.get("questions", [])
-                if not questions_raw:
-                    continue
-                questions = [Question.from_dict(q) for q in questions_raw]
-                metadata = DocumentMetadata(
-                    pk_prefix=form.pk_prefix.data.strip(),
-                    pk_id=form.pk_id.data.strip(),
-                    ipk_prefix=form.ipk_prefix.data.strip(),
-                    ipk_id=form.ipk_id.data.strip(),
-                    description=form.description.data.strip(),
-                    document_title=course["name"],
-                )
-
-                timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-                sanitized_name = sanitize_filename(f"{course['name']}_{timestamp}")
-                format_choice = form.format.data
-                output_folder = Path(current_app.config["OUTPUT_FOLDER"])
-                output_folder.mkdir(parents=True, exist_ok=True)
-                # Расширения файлов для выгрузки (не всегда совпадает с ключом формата в UI).
-                # Например: формат "excel" экспортируется как .xlsx.
-                format_ext = {
-                    "excel": "xlsx",
-                }.get(format_choice, format_choice)
-                output_path = output_folder / f"{sanitized_name}.{format_ext}"
-
-                generated_successfully = False
-
-                # Пытаемся применить выбранный набор шаблонов (если не "standard")
-                template_map = None
-                selected_set_name = (form.template_name.data or "").strip()
-                selected_cfg_by_type: dict[str, dict] = {}
-                if selected_set_name and selected_set_name != "standard":
-                    matching = [t for t in all_templates if (t.get("name") or "").strip() == selected_set_name]
-                    for tpl in matching:
-                        try:
-                            cfg = json.loads(tpl.get("config", "{}") or "{}")
-                        except json.JSONDecodeError:
-                            cfg = {}
-                        if cfg and tpl.get("type"):
-                            selected_cfg_by_type[str(tpl.get("type"))] = cfg
-
-                    # Если в наборе есть только один тип (legacy), применяем его ко всем типам в курсе
-                    if len(selected_cfg_by_type) == 1:
-                        only_cfg = next(iter(selected_cfg_by_type.values()))
-                        course_types = sorted({(q.get("type") or "") for q in questions_raw if q.get("type")})
-                        selected_cfg_by_type = {t: only_cfg for t in course_types}
-
-                    if selected_cfg_by_type:
-                        template_map = selected_cfg_by_type
-
-                # MVP1: если HTML и v2-шаблон — используем новый движок с блоками.
-                # Для HTML поддерживаем v2-конфиги по каждому типу.
-                any_v2 = any(isinstance(cfg, dict) and cfg.get("version") == 2 for cfg in selected_cfg_by_type.values())
-                if format_choice == "html" and any_v2:
-                    # дефолтные пресеты для всех типов, которые встретились в курсе
-                    templates_by_type = {}
-                    for q in questions_raw:
-                        q_type = q.get("type", "")
-                        if q_type and q_type not in templates_by_type:
-                            templates_by_type[q_type] = preset_table_default(q_type)
-                    # переопределяем типы, для которых есть выбранные v2-конфиги
-                    for t, cfg in selected_cfg_by_type.items():
-                        if isinstance(cfg, dict) and cfg.get("version") == 2:
-                            templates_by_type[t] = cfg
-                    html_text = render_document_html(
-                        questions=questions_raw,
-                        metadata=metadata.to_dict() | {"document_title": metadata.document_title},
-                        templates_by_type=templates_by_type,
-                        title=course["name"],
-                    )
-                    output_path.write_text(html_text, encoding="utf-8")
-                    generated_successfully = True
-                elif format_choice == "docx":
-                    generator = DocumentGenerator(metadata)
-                    try:
-                        result = generator.generate(questions, str(output_path), template_map=template_map)
-                        generated_successfully = True
-                        skipped = result.get("skipped_types") or {}
-                        if skipped:
-                            skipped_msg = ", ".join(f"{k}: {v}" for k, v in skipped.items())
-                            flash(
-                                f"Часть вопросов пропущена (нет шаблона): {skipped_msg}",
-                                "warning",
-                            )
-                        errs = result.get("errors") or []
-                        if errs:
-                            flash(
-                                f"Сформирован документ, но с ошибками рендеринга: {len(errs)}",
-                                "warning",
-                            )
-                    except Exception as e:
-                        current_app.logger.exception("DOCX export failed for course=%s", course.get("name"))
-                        history.log("Export failed", f"DOCX: {course.get('name', '')}: {e}")
-                        flash(f"Ошибка экспорта DOCX для курса '{course['name']}': {e}", "error")
-                        continue
-                else:
-                    exporter = EXPORTER_CLASSES.get(format_choice)
-                    if exporter:
-                        try:
-                            exporter.export(questions, metadata, str(output_path), template_map=template_map)
-                            generated_successfully = True
-                        except NotImplementedError:
-                            flash(
-                                f"Экспорт в формат {format_choice.upper()} пока недоступен, используйте DOCX.",
-                                "info",
-                            )
-                            continue
-                        except Exception as e:
-                            current_app.logger.exception(
-                                "Export failed: format=%s course=%s", format_choice, course.get("name")
-                            )
-                            history.log(
-                                "Export failed",
-                                f"{format_choice.upper()}: {course.get('name', '')}: {e}",
-                            )
-                            flash(
-                                f"Ошибка экспорта {format_choice.upper()} для курса '{course['name']}': {e}",
-                                "error",
-                            )
-                            continue
-                    else:
-                        flash(f"Неизвестный формат {format_choice}.", "error")
-                        continue
-
-                if not generated_successfully:
+                stem = sanitize_filename(f"{course['name']}_{timestamp}")
+                stem_counts[stem] += 1
+                output_stems.append(stem if stem_counts[stem] == 1 else f"{stem}_{stem_counts[stem]}")
+            logger = current_app.logger
+            # Курсы экспортируются параллельно (генераторы в основном пишут файлы и ждут I/O);
+            # flash, история и список экспортов обновляются здесь, в потоке запроса, в исходном порядке.
+            max_workers = min(len(selected_courses), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(_export_course, course, options, all_templates, output_folder, stem, logger)
+                    for course, stem in zip(selected_courses, output_stems)
+                ]
+                results = [future.result() for future in futures]
+
+            for record, messages, history_entries in results:
+                for action, detail in history_entries:
+                    history.log(action, detail)
+                for message, category in messages:
+                    flash(message, category)
+                if record is None:
                     continue
-
-                record = {
-                    "id": str(uuid4()),
-                    "course_name": course["name"],
-                    "format": format_choice,
-                    "filename": output_path.name,
-                    "path": str(output_path),
-                    "created_at": datetime.utcnow().isoformat(),
-                }
                 _append_export(record)
                 generated.append(record)
 
@@ -1058,13 +1311,50 @@ def export():
         "export.html",
         form=form,
         courses=courses,
-        exports=list(reversed(_get_exports())),
+        exports=_get_exports(),
     )
 
 
+# Варианты выбора шаблонов на странице экспорта; пересчитываются только после изменения хранилищ
+_TEMPLATE_CHOICES_CACHE: dict[tuple, list[tuple[str, str]]] = {}
+_METADATA_CHOICES_CACHE: dict[str, Any] = {"source": None, "value": None}
+
+
+def _template_choices(store_fingerprint: tuple, all_templates: list[dict]) -> list[tuple[str, str]]:
+    choices = _TEMPLATE_CHOICES_CACHE.get(store_fingerprint)
+    if choices is not None:
+        return choices
+    sets: dict[str, set[str]] = {}
+    for tpl in all_templates:
+        name = (tpl.get("name") or "").strip() or "Без названия"
+        t = (tpl.get("type") or "").strip()
+        sets.setdefault(name, set())
+        if t:
+            sets[name].add(t)
+    choices = [("standard", "Стандартный")]
+    for name in sorted(sets.keys(), key=lambda s: s.lower()):
+        types = sorted(sets[name])
+        label = name if not types else f"{name} (типов: {len(types)})"
+        choices.append((name, label))
+    _TEMPLATE_CHOICES_CACHE.clear()
+    _TEMPLATE_CHOICES_CACHE[store_fingerprint] = choices
+    return choices
+
+
+def _metadata_choices() -> list[tuple[str, str]]:
+    # list_templates() отдаёт закешированный список: новый объект появляется только после изменения хранилища
+    metadata_templates = metadata_storage.list_templates()
+    if _METADATA_CHOICES_CACHE["source"] is not metadata_templates:
+        _METADATA_CHOICES_CACHE["value"] = [("", "Без шаблона")] + [
+            (tpl["id"], tpl["name"]) for tpl in metadata_templates
+        ]
+        _METADATA_CHOICES_CACHE["source"] = metadata_templates
+    return _METADATA_CHOICES_CACHE["value"]
+
+
 @main_bp.get("/exports")
 def exports_history():
-    return render_template("export_history.html", exports=list(reversed(_get_exports())))
+    return render_template("export_history.html", exports=_get_exports())
 
 
 @main_bp.get("/exports/<export_id>/download")
@@ -1072,16 +1362,15 @@ def export_download(export_id: str):
     """
     Скачивание ранее сгенерированного файла экспорта (из текущей сессии).
     """
-    exports = _get_exports()
-    record = next((item for item in exports if item.get("id") == export_id), None)
+    record = next((item for item in _get_exports() if item.get("id") == export_id), None)
     if not record:
         flash("Экспорт не найден (возможно, очищена сессия).", "error")
         return redirect(url_for("main.export"))
 
-    output_root = Path(current_app.config["OUTPUT_FOLDER"]).resolve()
+    output_root = current_app.config["_OUTPUT_ROOT_RESOLVED"]
     # Берём путь из записи, но защищаемся от подмены/выхода из папки output
     candidate = Path(record.get("path") or (output_root / (record.get("filename") or ""))).resolve()
-    if output_root not in candidate.parents and candidate != output_root:
+    if not candidate.is_relative_to(output_root):
         abort(400)
     if not candidate.exists() or not candidate.is_file():
         flash("Файл экспорта не найден на сервере.", "error")
@@ -1093,7 +1382,18 @@ def export_download(export_id: str):
     if candidate.suffix.lower() == ".excel":
         download_name = candidate.with_suffix(".xlsx").name
 
-    return send_file(candidate, as_attachment=True, download_name=download_name)
+    # Повторное скачивание того же файла отвечает 304 без тела
+    st = candidate.stat()
+    response = send_file(
+        candidate,
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+        last_modified=st.st_mtime,
+    )
+    response.headers["Cache-Control"] = "private, max-age=3600"
+    return response
 
 
 @main_bp.get("/activity")
@@ -1103,7 +1403,7 @@ def activity():
 
 @main_bp.get("/statistics")
 def statistics():
-    combined = _combined_snapshot()
+    combined = _combined_snapshot_cached()
     if not (combined.get("courses") or combined.get("questions")):
         return redirect(url_for("main.upload"))
     stats = stats_utils.overall_stats(combined, _get_uploads())
@@ -1132,11 +1432,10 @@ def statistics_course(course_id: str):
 
 @main_bp.get("/statistics/report")
 def statistics_report():
-    combined = _combined_snapshot()
+    combined = _combined_snapshot_cached()
     if not (combined.get("courses") or combined.get("questions")):
         return redirect(url_for("main.upload"))
-    csv_data = stats_utils.build_csv_report(combined)
-    response = Response(csv_data, mimetype="text/csv")
+    response = Response(stream_with_context(stats_utils.iter_csv_report(combined)), mimetype="text/csv")
     response.headers["Content-Disposition"] = "attachment; filename=statistics_report.csv"
     return response
 
@@ -1147,17 +1446,14 @@ def statistics_course_export(course_id: str):
     if not course:
         flash("Курс не найден.", "error")
         return redirect(url_for("main.statistics"))
-    lines = ["Question Name,Type"]
-    for question in course.get("questions", []):
-        lines.append(f"{question['name']},{question['type']}")
-    response = Response("\n".join(lines), mimetype="text/csv")
+    response = Response(stream_with_context(stats_utils.iter_course_csv(course)), mimetype="text/csv")
     response.headers["Content-Disposition"] = f"attachment; filename=course_{course_id}_report.csv"
     return response
 
 
 @main_bp.get("/validation")
 def validation():
-    combined = _combined_snapshot()
+    combined = _combined_snapshot_cached()
     if not (combined.get("courses") or combined.get("questions")):
         return redirect(url_for("main.upload"))
     issues = validator.validate_snapshot(combined)
@@ -1198,20 +1494,30 @@ def settings_reset():
         flash("Не удалось выполнить очистку данных.", "error")
         return redirect(url_for("main.settings"))
 
-    # Очистка файлов
+    # Очистка файлов (отложенные записи сначала сбрасываем, чтобы они не вернули удалённое)
+    pending_writer.flush()
+    paths: list[str] = []
     for key in ("UPLOAD_FOLDER", "OUTPUT_FOLDER", "TEMP_FOLDER"):
         folder = Path(current_app.config[key])
         try:
             folder.mkdir(parents=True, exist_ok=True)
-            for p in folder.iterdir():
-                if p.is_file():
-                    p.unlink(missing_ok=True)
+            # scandir отдаёт тип записи без отдельного stat на каждый файл
+            with os.scandir(folder) as it:
+                paths.extend(entry.path for entry in it if entry.is_file())
         except Exception:  # pylint: disable=broad-except
             current_app.logger.exception("Failed to purge folder: %s", folder)
+    if paths:
+        # Удаление — чистые системные вызовы, поэтому потоки перекрывают их задержки
+        with ThreadPoolExecutor(max_workers=min(8, len(paths))) as executor:
+            for path, error in zip(paths, executor.map(_unlink_quiet, paths)):
+                if error is not None:
+                    current_app.logger.error("Failed to delete %s: %s", path, error)
+        forget_snapshots(paths)
 
     # Очистка сессионных данных
-    for k in ("uploads", "exports", "history", "current_file_id"):
-        session.pop(k, None)
+    for k in ("uploads", "exports", "history"):
+        sm.clear_list(k)
+    session.pop("current_file_id", None)
     session.modified = True
 
     history.log("Reset", "Очищены временные данные (uploads/output/temp) и сессия")
@@ -1219,26 +1525,62 @@ def settings_reset():
     return redirect(url_for("main.settings"))
 
 
+def _unlink_quiet(path: str) -> OSError | None:
+    """Удаляет файл; отсутствующий файл не ошибка. Возвращает ошибку вместо исключения."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return e
+    return None
+
+
+# Классы \w, \b, \s, \d (и POSIX [:...:]) в re2 только ASCII: на кириллице результат поиска разошёлся бы с re
+_RE2_UNSAFE_RE = re.compile(r"(?<!\\)(?:\\\\)*\\[wWbBsSdD]|\[:")
+
+if re2 is not None:
+    _RE2_OPTIONS = re2.Options()
+    _RE2_OPTIONS.log_errors = False  # неподдерживаемый синтаксис — не ошибка, а повод взять re
+
+
+def _compile_search(pattern: str):
+    """
+    Регистронезависимый search() для поиска вопросов. Синтаксис проверяет стандартный re (re.error
+    пробрасывается); re2 берётся, только если он доступен и понимает паттерн так же.
+    """
+    compiled = re.compile(pattern, re.IGNORECASE)
+    if re2 is not None and not _RE2_UNSAFE_RE.search(pattern):
+        try:
+            return re2.compile("(?i)" + pattern, _RE2_OPTIONS).search
+        except re2.error:
+            # Обратные ссылки, lookaround и т.п. re2 не поддерживает
+            pass
+    return compiled.search
+
+
+def _lines_text(question: dict, key: str) -> str:
+    """Список (answers/correct_answers) как текст для textarea; запоминается в вопросе до его изменения."""
+    memo_key = f"_{key}_text"
+    text = question.get(memo_key)
+    if text is None:
+        text = question[memo_key] = "\n".join(question.get(key) or [])
+    return text
+
+
 def _split_lines(value: str | None) -> list[str]:
     if not value:
         return []
     return [line.strip() for line in value.splitlines() if line.strip()]
 
 
-def _type_stats(questions: list[dict]) -> dict[str, int]:
-    stats: dict[str, int] = {}
-    for question in questions:
-        stats[question["type"]] = stats.get(question["type"], 0) + 1
-    return stats
-
-
 def _is_valid_json(value: str | None) -> bool:
     if not value:
         return True
     try:
-        json.loads(value)
+        fastjson.loads(value)
         return True
-    except json.JSONDecodeError:
+    except fastjson.JSONDecodeError:
         return False
 
 
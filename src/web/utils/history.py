@@ -4,34 +4,41 @@
 
 from __future__ import annotations
 
+from collections import deque
 from datetime import datetime
 from typing import List
 
-from flask import session
+from flask import g
+
+from . import session_manager as sm
+
+# Сколько последних записей хранится в сессии
+HISTORY_LIMIT = 200
 
 
 def log(action: str, details: str) -> None:
-    history = session.get("history", [])
-    history.append(
+    """Добавляет запись в буфер запроса; в сессию он попадает одним изменением в flush()."""
+    pending = g.setdefault("_pending_history", [])
+    pending.append(
         {
             "timestamp": datetime.utcnow().isoformat(),
             "action": action,
             "details": details,
         }
     )
-    session["history"] = history[-200:]
-    session.modified = True
-
-
-def list_history() -> List[dict]:
-    return session.get("history", [])
-
-
-
-
-
-
 
 
+def flush() -> None:
+    """Переносит записи, накопленные за запрос, в сессию."""
+    pending = g.pop("_pending_history", None)
+    if not pending:
+        return
+    history = deque(sm.get_list("history"), maxlen=HISTORY_LIMIT)
+    history.extend(pending)
+    sm.set_list("history", list(history))
 
 
+def list_history() -> List[dict]:
+    pending = g.get("_pending_history")
+    history = sm.get_list("history")
+    return history + pending if pending else history
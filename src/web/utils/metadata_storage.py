@@ -4,38 +4,69 @@
 
 from __future__ import annotations
 
-import json
 from typing import List, Optional
 from uuid import uuid4
 
 from flask import current_app
 
+from src.utils import fastjson
+
+from .pending_writer import pending_writer
+
 
 def _store_path():
     return current_app.config["METADATA_STORE"]
 
 
-def _read_store() -> List[dict]:
+# Кеш хранилища: путь -> ((st_mtime_ns, st_size), шаблоны, индекс по id).
+# Списки и словари общие: читатели их не изменяют, писатели работают с копиями.
+# Запись отложенная (pending_writer), поэтому чтение сначала сбрасывает её на диск.
+_CACHE: dict[str, tuple[tuple[int, int], List[dict], dict[str, dict]]] = {}
+
+
+def _stamp(path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _remember(path, data: List[dict]) -> tuple[List[dict], dict[str, dict]]:
+    by_id = {tpl.get("id"): tpl for tpl in data}
+    _CACHE[str(path)] = (_stamp(path), data, by_id)
+    return data, by_id
+
+
+def _load() -> tuple[List[dict], dict[str, dict]]:
     path = _store_path()
+    pending_writer.flush(path)
     if not path.exists():
         path.write_text("[]", encoding="utf-8")
+    cached = _CACHE.get(str(path))
+    if cached is not None and cached[0] == _stamp(path):
+        return cached[1], cached[2]
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return []
+        data = fastjson.loads(path.read_bytes())
+    except fastjson.JSONDecodeError:
+        data = []
+    return _remember(path, data)
+
+
+def _read_store() -> List[dict]:
+    """Копия списка шаблонов для изменения и последующей записи."""
+    return list(_load()[0])
 
 
 def _write_store(data: List[dict]) -> None:
     path = _store_path()
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    pending_writer.schedule(path, fastjson.dumps_bytes(data, indent=True))
+    _CACHE.pop(str(path), None)
 
 
 def list_templates() -> List[dict]:
-    return _read_store()
+    return _load()[0]
 
 
 def get_template(template_id: str) -> Optional[dict]:
-    return next((tpl for tpl in _read_store() if tpl["id"] == template_id), None)
+    return _load()[1].get(template_id)
 
 
 def create_template(data: dict) -> dict:
@@ -56,24 +87,20 @@ def create_template(data: dict) -> dict:
 
 def update_template(template_id: str, data: dict) -> bool:
     templates = _read_store()
-    changed = False
-    for template in templates:
+    for index, template in enumerate(templates):
         if template["id"] == template_id:
-            template.update(
-                {
-                    "name": data.get("name", template["name"]),
-                    "pk_prefix": data.get("pk_prefix", template["pk_prefix"]),
-                    "pk_id": data.get("pk_id", template["pk_id"]),
-                    "ipk_prefix": data.get("ipk_prefix", template["ipk_prefix"]),
-                    "ipk_id": data.get("ipk_id", template["ipk_id"]),
-                    "description": data.get("description", template["description"]),
-                }
-            )
-            changed = True
-            break
-    if changed:
-        _write_store(templates)
-    return changed
+            templates[index] = {
+                **template,
+                "name": data.get("name", template["name"]),
+                "pk_prefix": data.get("pk_prefix", template["pk_prefix"]),
+                "pk_id": data.get("pk_id", template["pk_id"]),
+                "ipk_prefix": data.get("ipk_prefix", template["ipk_prefix"]),
+                "ipk_id": data.get("ipk_id", template["ipk_id"]),
+                "description": data.get("description", template["description"]),
+            }
+            _write_store(templates)
+            return True
+    return False
 
 
 def delete_template(template_id: str) -> bool:
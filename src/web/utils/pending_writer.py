@@ -0,0 +1,92 @@
+"""
+Отложенная атомарная запись файлов хранилищ.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from pathlib import Path
+
+# Окно, в котором частые перезаписи одного файла склеиваются в одну (секунды)
+FLUSH_DELAY = 0.1
+
+
+# O_BINARY есть только в Windows: без него os.write переводил бы \n в \r\n
+_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+
+def write_atomic(path: Path, payload: bytes) -> None:
+    """
+    Пишет во временный файл рядом с целевым, сбрасывает его на диск (fsync)
+    и подменяет целевой через os.replace: при сбое остаётся либо старая, либо новая версия.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    fd = os.open(tmp_path, _OPEN_FLAGS, 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+
+class PendingWriter:
+    """
+    Откладывает запись файлов: на диск попадает только последняя версия данных,
+    не позже чем через `delay` секунд. Перед чтением файла нужно вызвать flush(path).
+    """
+
+    def __init__(self, delay: float = FLUSH_DELAY) -> None:
+        self._delay = delay
+        self._lock = threading.Lock()
+        # Сигнал о завершении записи: flush ждёт файлы, которые прямо сейчас пишет другой поток
+        self._written = threading.Condition(self._lock)
+        self._pending: dict[str, tuple[Path, bytes]] = {}
+        self._inflight: set[str] = set()
+        self._timer: threading.Timer | None = None
+
+    def schedule(self, path: Path, payload: bytes) -> None:
+        with self._lock:
+            self._pending[str(path)] = (Path(path), payload)
+            if self._timer is None:
+                self._timer = threading.Timer(self._delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self, path: Path | None = None) -> None:
+        """
+        Записывает отложенные данные одного файла (path) или все сразу.
+        Возвращается только после того, как файл (или все файлы) действительно записан,
+        в том числе если запись уже начал другой поток.
+        """
+        with self._written:
+            if path is None:
+                self._written.wait_for(lambda: not self._inflight)
+                items = list(self._pending.values())
+                self._pending.clear()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            else:
+                key = str(path)
+                self._written.wait_for(lambda: key not in self._inflight)
+                item = self._pending.pop(key, None)
+                items = [item] if item is not None else []
+            keys = {str(target) for target, _ in items}
+            self._inflight |= keys
+        try:
+            for target, payload in items:
+                write_atomic(target, payload)
+        finally:
+            with self._written:
+                self._inflight -= keys
+                self._written.notify_all()
+
+
+pending_writer = PendingWriter()
+atexit.register(pending_writer.flush)
@@ -6,11 +6,57 @@ from __future__ import annotations
 
 from typing import Any
 
-from flask import session
+from flask import g, session
+
+try:
+    # msgpack: списки сессии хранятся одним бинарным значением вместо вложенных структур
+    import msgpack
+except ImportError:
+    msgpack = None
 
 from .storage import load_snapshot, save_snapshot
 
 
+def _blob_key(key: str) -> str:
+    return f"{key}_blob"
+
+
+def get_list(key: str) -> list[dict[str, Any]]:
+    """
+    Список из сессии (uploads, exports, history).
+    Хранится msgpack-блобом и разбирается один раз за запрос (flask.g);
+    после изменения списка нужно вызвать set_list.
+    """
+    cache = g.setdefault("_session_lists", {})
+    items = cache.get(key)
+    if items is None:
+        blob = session.get(_blob_key(key)) if msgpack is not None else None
+        if blob is not None:
+            items = msgpack.unpackb(blob, raw=False)
+        else:
+            # Сессии старого формата хранят обычный список
+            items = session.get(key, [])
+        cache[key] = items
+    return items
+
+
+def set_list(key: str, items: list[dict[str, Any]]) -> None:
+    g.setdefault("_session_lists", {})[key] = items
+    if msgpack is not None:
+        session[_blob_key(key)] = msgpack.packb(items, use_bin_type=True)
+        session.pop(key, None)
+    else:
+        session[key] = items
+    session.modified = True
+
+
+def clear_list(key: str) -> None:
+    g.get("_session_lists", {}).pop(key, None)
+    session.pop(key, None)
+    session.pop(_blob_key(key), None)
+    session.modified = True
+
+
 def _file_id_from_question_id(question_id: str) -> str | None:
     """
     Пытаемся извлечь file_id из question_id вида:
@@ -43,7 +89,7 @@ def get_question(question_id: str, file_id: str | None = None) -> dict[str, Any]
     snapshot = get_snapshot(inferred)
     if not snapshot:
         return None
-    return next((q for q in snapshot.get("questions", []) if q["id"] == question_id), None)
+    return snapshot["_question_by_id"].get(question_id)
 
 
 def update_question(question_id: str, updated_fields: dict[str, Any]) -> bool:
@@ -52,21 +98,13 @@ def update_question(question_id: str, updated_fields: dict[str, Any]) -> bool:
     if not snapshot:
         return False
 
-    changed = False
-    for question in snapshot.get("questions", []):
-        if question["id"] == question_id:
-            question.update(updated_fields)
-            changed = True
-            break
-
-    if not changed:
+    if question_id not in snapshot["_question_by_id"]:
         return False
-
-    for course in snapshot.get("courses", []):
-        for question in course.get("questions", []):
-            if question["id"] == question_id:
-                question.update(updated_fields)
-                break
+    for question in snapshot["_question_refs"][question_id]:
+        # Сбрасываем мемо текста ответов для формы редактирования
+        question.pop("_answers_text", None)
+        question.pop("_correct_answers_text", None)
+        question.update(updated_fields)
 
     save_snapshot(snapshot["id"], snapshot)
     _refresh_upload_meta(snapshot)
@@ -78,7 +116,7 @@ def add_question(course_id: str, question_payload: dict[str, Any]) -> bool:
     if not snapshot:
         return False
 
-    target_course = next((c for c in snapshot.get("courses", []) if c["id"] == course_id), None)
+    target_course = snapshot["_course_by_id"].get(course_id)
     if not target_course:
         return False
 
@@ -94,14 +132,13 @@ def add_question(course_id: str, question_payload: dict[str, Any]) -> bool:
 
 
 def _refresh_upload_meta(snapshot: dict[str, Any]) -> None:
-    uploads = session.get("uploads", [])
+    uploads = get_list("uploads")
     for item in uploads:
         if item["id"] == snapshot["id"]:
             item["course_count"] = len(snapshot.get("courses", []))
             item["question_count"] = len(snapshot.get("questions", []))
             break
-    session["uploads"] = uploads
-    session.modified = True
+    set_list("uploads", uploads)
 
 
 
@@ -4,30 +4,49 @@
 
 from __future__ import annotations
 
-from collections import Counter
+from collections import Counter, namedtuple
 from datetime import datetime
-from typing import Any, Dict, List
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List
+
+
+# Строка распределения вопросов по курсам (шаблон обращается к полям как к атрибутам)
+CourseShare = namedtuple("CourseShare", ("id", "name", "question_count"))
+_course_id_name = itemgetter("id", "name")
+
+
+def type_counter(course: dict) -> Counter:
+    """Распределение вопросов курса по типам; считается один раз и хранится в курсе (`_type_counter`)."""
+    counter = course.get("_type_counter")
+    if counter is None:
+        counter = course["_type_counter"] = Counter(map(itemgetter("type"), course.get("questions", [])))
+    return counter
 
 
 def overall_stats(snapshot: dict, uploads: List[dict]) -> dict:
-    questions = snapshot.get("questions", [])
-    courses = snapshot.get("courses", [])
-
-    type_distribution = Counter(q["type"] for q in questions)
-    course_distribution = [
-        {
-            "id": course["id"],
-            "name": course["name"],
-            "question_count": course.get("question_count", 0),
-        }
-        for course in courses
-    ]
+    # Часть, зависящая только от снапшота, кешируется в нём самом
+    cached = snapshot.get("_overall_stats")
+    if cached is None:
+        courses = snapshot.get("courses", [])
+        type_distribution: Counter = Counter()
+        for course in courses:
+            type_distribution.update(type_counter(course))
+        course_distribution = [
+            CourseShare(*_course_id_name(course), course.get("question_count", 0)) for course in courses
+        ]
+        cached = snapshot["_overall_stats"] = (
+            len(snapshot.get("questions", [])),
+            len(courses),
+            type_distribution,
+            course_distribution,
+        )
+    total_questions, total_courses, type_distribution, course_distribution = cached
 
     recent_upload = max(uploads, key=lambda item: item["uploaded_at"], default=None)
 
     return {
-        "total_questions": len(questions),
-        "total_courses": len(courses),
+        "total_questions": total_questions,
+        "total_courses": total_courses,
         "type_distribution": type_distribution,
         "course_distribution": course_distribution,
         "recent_upload": recent_upload,
@@ -36,18 +55,27 @@ def overall_stats(snapshot: dict, uploads: List[dict]) -> dict:
 
 
 def course_stats(course: dict) -> dict:
-    questions = course.get("questions", [])
-    type_distribution = Counter(q["type"] for q in questions)
     return {
         "name": course["name"],
-        "question_count": len(questions),
-        "type_distribution": type_distribution,
+        "question_count": len(course.get("questions", [])),
+        "type_distribution": type_counter(course),
     }
 
 
-def build_csv_report(snapshot: dict) -> str:
-    lines = ["Course,Question Count"]
+def iter_csv_report(snapshot: dict) -> Iterator[str]:
+    """CSV по курсам построчно (для потоковой отдачи)."""
+    yield "Course,Question Count"
     for course in snapshot.get("courses", []):
-        lines.append(f"{course['name']},{course.get('question_count', 0)}")
-    return "\n".join(lines)
+        yield f"\n{course['name']},{course.get('question_count', 0)}"
+
+
+def build_csv_report(snapshot: dict) -> str:
+    return "".join(iter_csv_report(snapshot))
+
+
+def iter_course_csv(course: dict) -> Iterator[str]:
+    """CSV по вопросам курса построчно (для потоковой отдачи)."""
+    yield "Question Name,Type"
+    for question in course.get("questions", []):
+        yield f"\n{question['name']},{question['type']}"
 
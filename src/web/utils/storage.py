@@ -4,34 +4,139 @@
 
 from __future__ import annotations
 
-import json
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any
 
 from flask import current_app
 
+from src.utils import fastjson
+
+from .pending_writer import pending_writer
+
+try:
+    # msgpack: бинарный формат, быстрее и компактнее JSON для вложенных снапшотов
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Кеш разобранных снапшотов в памяти процесса (LRU): путь -> ((st_mtime_ns, st_size), данные).
+# Возвращаемые словари общие для всех запросов (без deepcopy: копия на каждый доступ вернула бы
+# стоимость полного разбора). Изменять их можно только с последующим save_snapshot.
+_SNAPSHOT_CACHE: OrderedDict[str, tuple[tuple[int, int], dict[str, Any]]] = OrderedDict()
+_SNAPSHOT_CACHE_SIZE = 32
+
 
 def _snapshot_dir() -> Path:
     return Path(current_app.config["TEMP_FOLDER"])
 
 
+_SNAPSHOT_EXT = ".msgpack" if msgpack is not None else ".json"
+
+
 def _snapshot_path(file_id: str) -> Path:
+    return _snapshot_dir() / f"{file_id}{_SNAPSHOT_EXT}"
+
+
+def _legacy_snapshot_path(file_id: str) -> Path:
     return _snapshot_dir() / f"{file_id}.json"
 
 
+def _dumps(data: dict[str, Any]) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(data, use_bin_type=True)
+    # Снапшоты читает только программа — отступы не нужны
+    return fastjson.dumps_bytes(data)
+
+
+def _loads(raw: bytes) -> dict[str, Any]:
+    if msgpack is not None:
+        return msgpack.unpackb(raw, raw=False)
+    return fastjson.loads(raw)
+
+
+def _migrate_legacy_snapshot(file_id: str) -> bool:
+    """Переводит снапшот из старого JSON-файла в msgpack. Возвращает True, если было что переводить."""
+    if msgpack is None:
+        return False
+    legacy = _legacy_snapshot_path(file_id)
+    if not legacy.exists():
+        return False
+    save_snapshot(file_id, fastjson.loads(legacy.read_bytes()))
+    pending_writer.flush(_snapshot_path(file_id))
+    legacy.unlink(missing_ok=True)
+    return True
+
+
+def snapshot_stamp(file_id: str) -> tuple[int, int] | None:
+    """Штамп файла снапшота (st_mtime_ns, st_size) или None, если его нет."""
+    path = _snapshot_path(file_id)
+    pending_writer.flush(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _without_private(item: dict[str, Any]) -> dict[str, Any]:
+    if not any(key.startswith("_") for key in item):
+        return item
+    return {key: value for key, value in item.items() if not key.startswith("_")}
+
+
 def save_snapshot(file_id: str, data: dict[str, Any]) -> None:
-    """Сохраняет результаты парсинга во временный файл."""
+    """Сохраняет результаты парсинга во временный файл (атомарно, с отложенной записью)."""
     path = _snapshot_path(file_id)
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Служебные индексы и мемо (ключи с "_") строятся в памяти и на диск не попадают
+    payload = {key: value for key, value in data.items() if not key.startswith("_")}
+    if "questions" in payload:
+        payload["questions"] = [_without_private(question) for question in payload["questions"] or []]
+    if "courses" in payload:
+        payload["courses"] = [_without_private(course) for course in payload["courses"] or []]
+    pending_writer.schedule(path, _dumps(payload))
+    _SNAPSHOT_CACHE.pop(str(path), None)
 
 
 def load_snapshot(file_id: str) -> dict[str, Any] | None:
-    """Загружает результаты парсинга, если они существуют."""
+    """Загружает результаты парсинга, если они существуют (повторно — из кеша, пока mtime и размер файла прежние)."""
     path = _snapshot_path(file_id)
-    if not path.exists():
-        return None
-    return json.loads(path.read_text(encoding="utf-8"))
-
+    key = str(path)
+    stamp = snapshot_stamp(file_id)
+    if stamp is None:
+        _SNAPSHOT_CACHE.pop(key, None)
+        if not _migrate_legacy_snapshot(file_id):
+            return None
+        stamp = snapshot_stamp(file_id)
+    cached = _SNAPSHOT_CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        _SNAPSHOT_CACHE.move_to_end(key)
+        return cached[1]
+    data = _loads(path.read_bytes())
+    # Снапшоты старых версий: file_name в вопросах ещё не было
+    file_name = data.get("original_name", "")
+    for question in data.get("questions") or []:
+        question.setdefault("file_name", file_name)
+    data["_course_by_id"] = {course.get("id"): course for course in data.get("courses") or []}
+    data["_question_by_id"] = {question.get("id"): question for question in data.get("questions") or []}
+    # Все копии вопроса (общий список и список курса) — чтобы правка обновляла их без поиска
+    question_refs: dict[str, list[dict[str, Any]]] = {}
+    for question in data.get("questions") or []:
+        question_refs.setdefault(question.get("id"), []).append(question)
+    for course in data.get("courses") or []:
+        for question in course.get("questions") or []:
+            question_refs.setdefault(question.get("id"), []).append(question)
+    data["_question_refs"] = question_refs
+    _SNAPSHOT_CACHE[key] = (stamp, data)
+    _SNAPSHOT_CACHE.move_to_end(key)
+    if len(_SNAPSHOT_CACHE) > _SNAPSHOT_CACHE_SIZE:
+        _SNAPSHOT_CACHE.popitem(last=False)
+    return data
 
 
+def forget_snapshots(paths: list[str]) -> None:
+    """Убирает из кеша снапшоты удалённых файлов (пути как на диске)."""
+    for path in paths:
+        _SNAPSHOT_CACHE.pop(str(Path(path)), None)
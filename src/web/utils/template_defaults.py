@@ -23,34 +23,36 @@ Schema v1 (упрощённо):
 
 from __future__ import annotations
 
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, Tuple
+
+
+# Константы собираются один раз при импорте; default_config отдаёт их свежие копии,
+# так что вызывающий код может менять результат.
+_STYLES_DEFAULT = MappingProxyType(
+    {
+        "header_color": "#C00000",
+        "title_size": 22,
+        "header_size": 16,
+        "body_size": 14,
+        "answer_size": 12,
+    }
+)
+
+# Table column widths in percent of available content width.
+_TYPE_LAYOUTS: Dict[str, Tuple[int, ...]] = {
+    "essay_gigachat": (10, 10, 80),
+    "shortanswer": (10, 10, 80),
+    "multichoice": (10, 45, 45),
+    "truefalse": (10, 45, 45),
+    "matching": (10, 25, 35, 30),
+}
 
 
 def default_config(question_type: str) -> dict:
-    base = {
+    cols = _TYPE_LAYOUTS.get(question_type)
+    return {
         "version": 1,
-        "styles": {
-            "header_color": "#C00000",
-            "title_size": 22,
-            "header_size": 16,
-            "body_size": 14,
-            "answer_size": 12,
-        },
-        "layout": {},
-    }
-
-    # Table column widths in percent of available content width.
-    type_layouts: Dict[str, List[int]] = {
-        "essay_gigachat": [10, 10, 80],
-        "shortanswer": [10, 10, 80],
-        "multichoice": [10, 45, 45],
-        "truefalse": [10, 45, 45],
-        "matching": [10, 25, 35, 30],
+        "styles": dict(_STYLES_DEFAULT),
+        "layout": {question_type: {"table_cols_pct": list(cols)}} if cols else {},
     }
-
-    cols = type_layouts.get(question_type)
-    if cols:
-        base["layout"][question_type] = {"table_cols_pct": cols}
-    return base
-
-
@@ -1,105 +1,364 @@
 """
 Хранилище пользовательских шаблонов вопросов.
+
+Состояние хранилища — снимок (TEMPLATE_STORE, JSON-список) плюс журнал операций рядом с ним
+(<имя>.log.jsonl, одна строка на операцию). Изменение дописывает в журнал одну строку;
+когда журнал заметно перерастает снимок, он сворачивается в новый снимок.
 """
 
 from __future__ import annotations
 
-import json
-from datetime import datetime
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
 from uuid import uuid4
 from typing import Any, List, Optional
 
 from flask import current_app
 
+try:
+    # Межпроцессная блокировка (несколько воркеров gunicorn); в Windows модуля нет
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from src.utils import fastjson
+
+from .pending_writer import write_atomic
+
+
+# Номер версии хранилища в этом процессе: растёт при каждой записи
+_VERSION = 0
+
+# Запись в журнал и его свёртка взаимоисключающие: иначе строка, дописанная между чтением
+# журнала и его удалением в compact, пропала бы. Между потоками — _WRITE_LOCK, между процессами —
+# flock на файле <имя>.lock рядом со снимком (без fcntl поддерживается только один процесс).
+_WRITE_LOCK = threading.Lock()
+
+# Сколько прошлых версий шаблона хранится в revisions
+REVISIONS_LIMIT = 10
+
+# Журнал сворачивается, когда он больше снимка в COMPACT_RATIO раз (но не раньше COMPACT_MIN_BYTES)
+COMPACT_RATIO = 2
+COMPACT_MIN_BYTES = 64 * 1024
+
+
+# Последняя отформатированная метка времени: [секунда, ISO-строка]
+_LAST_TS: list = [0, ""]
+
+
+def _now_iso() -> str:
+    """Текущее время UTC в ISO-формате с точностью до секунды; строка форматируется раз в секунду."""
+    t = int(time.time())
+    cached = _LAST_TS
+    if t != cached[0]:
+        cached[1] = datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None).isoformat()
+        cached[0] = t
+    return cached[1]
+
 
 def _store_path():
     return current_app.config["TEMPLATE_STORE"]
 
 
-def _read_store() -> List[dict]:
+def _log_path():
+    path = _store_path()
+    return path.with_name(f"{path.stem}.log.jsonl")
+
+
+def _lock_path():
+    path = _store_path()
+    return path.with_name(f"{path.stem}.lock")
+
+
+@contextmanager
+def _write_locked():
+    """Исключительный доступ на запись к журналу и снимку: в этом процессе и между процессами."""
+    with _WRITE_LOCK:
+        if fcntl is None:
+            yield
+            return
+        # Отдельный файл, а не сам журнал: журнал удаляется при свёртке, и блокировка на нём
+        # не исключала бы процесс, открывший уже новый файл
+        with open(_lock_path(), "a+b") as fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _stamp(path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _dumps(obj: Any) -> bytes:
+    # Компактный JSON без отступов (orjson, если установлен)
+    return fastjson.dumps_bytes(obj)
+
+
+# Кеш хранилища: путь снимка -> ((штамп снимка, штамп журнала), шаблоны, индекс по id).
+# У каждого шаблона "_config_parsed" — разобранный config; ключи с "_" на диск не пишутся.
+# Кешированные записи общие: читатели их не изменяют.
+_CACHE: dict[str, tuple[tuple, List[dict], dict[str, dict]]] = {}
+
+
+# Одинаковые строки config (текущая версия и ревизии) хранятся одним объектом: FIFO на _CONFIG_INTERN_SIZE строк
+_CONFIG_INTERN: dict[str, str] = {}
+_CONFIG_INTERN_SIZE = 256
+
+
+def _intern_config(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    interned = _CONFIG_INTERN.get(value)
+    if interned is None:
+        if len(_CONFIG_INTERN) >= _CONFIG_INTERN_SIZE:
+            _CONFIG_INTERN.pop(next(iter(_CONFIG_INTERN)))
+        interned = _CONFIG_INTERN[value] = value
+    return interned
+
+
+@lru_cache(maxsize=512)
+def parsed_config(cfg_str: str) -> Any:
+    """
+    Разобранная строка config. Одинаковые строки разбираются один раз (перечитывание хранилища,
+    формы создания/редактирования); результат общий — изменять его нельзя.
+    """
+    return fastjson.loads(cfg_str)
+
+
+def _parse_config(raw: Any) -> dict:
+    if isinstance(raw, dict):
+        return raw
+    try:
+        parsed = parsed_config(raw or "{}")
+    except (TypeError, fastjson.JSONDecodeError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _prepare(tpl: dict) -> None:
+    """Готовит прочитанный шаблон для кеша: общие строки config и разобранный config."""
+    if "config" in tpl:
+        tpl["config"] = _intern_config(tpl["config"])
+    revisions = tpl.get("revisions")
+    if isinstance(revisions, list):
+        for rev in revisions:
+            if isinstance(rev, dict) and "config" in rev:
+                rev["config"] = _intern_config(rev["config"])
+    tpl["_config_parsed"] = _parse_config(tpl.get("config"))
+
+
+def _apply(templates: dict[str, dict], entry: dict) -> None:
+    """
+    Применяет одну операцию журнала к шаблонам (id -> шаблон). Операции идемпотентны.
+    Изменённые шаблоны заменяются новыми словарями: старые могут быть в руках читателей кеша.
+    """
+    op = entry.get("op")
+    if op == "add":
+        tpl = dict(entry.get("tpl") or {})
+        if tpl.get("id"):
+            _prepare(tpl)
+            templates[tpl["id"]] = tpl
+    elif op == "patch":
+        tpl = templates.get(entry.get("id"))
+        if tpl is not None:
+            tpl = {**tpl, **(entry.get("fields") or {})}
+            _prepare(tpl)
+            templates[tpl["id"]] = tpl
+    elif op == "del":
+        templates.pop(entry.get("id"), None)
+
+
+def _replay(templates: dict[str, dict], log_path) -> None:
+    """Применяет к шаблонам все операции журнала."""
+    try:
+        lines = log_path.read_bytes().splitlines()
+    except FileNotFoundError:
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            entry = fastjson.loads(line)
+        except fastjson.JSONDecodeError:
+            # Недописанная строка (запись оборвалась) — пропускаем
+            continue
+        _apply(templates, entry)
+
+
+def _load() -> tuple[List[dict], dict[str, dict]]:
     path = _store_path()
     if not path.exists():
         path.write_text("[]", encoding="utf-8")
+    log_path = _log_path()
+    stamp = (_stamp(path), _stamp(log_path))
+    cached = _CACHE.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return []
+        data = fastjson.loads(path.read_bytes())
+    except fastjson.JSONDecodeError:
+        data = []
+    for tpl in data:
+        _prepare(tpl)
+    templates = {tpl.get("id"): tpl for tpl in data}
+    _replay(templates, log_path)
+    data = list(templates.values())
+    _CACHE[str(path)] = (stamp, data, templates)
+    return data, templates
+
+
+def public_view(template: dict) -> dict:
+    """Шаблон без служебных ключей (для записи на диск и экспорта)."""
+    return {k: v for k, v in template.items() if not k.startswith("_")}
+
+
+def _invalidate() -> None:
+    _CACHE.pop(str(_store_path()), None)
+    global _VERSION
+    _VERSION += 1
 
 
 def _write_store(data: List[dict]) -> None:
-    path = _store_path()
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    """Перезаписывает снимок целиком: одна сериализация, атомарная запись с fsync."""
+    write_atomic(_store_path(), _dumps([public_view(tpl) for tpl in data]))
+    _invalidate()
+
+
+def compact() -> None:
+    """Сворачивает журнал в снимок. Повторное применение журнала безопасно, поэтому сбой между шагами не страшен."""
+    with _write_locked():
+        _compact()
+
+
+def _compact() -> None:
+    templates, _ = _load()
+    _write_store(templates)
+    _log_path().unlink(missing_ok=True)
+    _invalidate()
+
+
+def _append(entry: dict) -> None:
+    """
+    Дописывает операцию в журнал и при необходимости сворачивает его.
+    Если кеш был актуален, операция применяется к его индексу: следующее чтение
+    не перечитывает снимок и журнал.
+    """
+    with _write_locked():
+        path = _store_path()
+        log_path = _log_path()
+        cached = _CACHE.get(str(path))
+        if cached is not None and cached[0] != (_stamp(path), _stamp(log_path)):
+            cached = None
+        line = _dumps(entry) + b"\n"
+        with open(log_path, "a+b") as fh:
+            end = fh.seek(0, os.SEEK_END)
+            if end:
+                fh.seek(end - 1)
+                if fh.read(1) != b"\n":
+                    # Предыдущая запись оборвалась — начинаем с новой строки, чтобы не склеиться с ней
+                    line = b"\n" + line
+            fh.write(line)
+            # Сохранение подтверждается пользователю — строка должна пережить сбой, как и снимок в write_atomic
+            fh.flush()
+            os.fsync(fh.fileno())
+        _invalidate()
+        if cached is not None:
+            templates = dict(cached[2])
+            _apply(templates, entry)
+            _CACHE[str(path)] = ((_stamp(path), _stamp(log_path)), list(templates.values()), templates)
+        log_size = (_stamp(log_path) or (0, 0))[1]
+        store_size = (_stamp(path) or (0, 0))[1]
+        if log_size > max(COMPACT_MIN_BYTES, COMPACT_RATIO * store_size):
+            _compact()
+
+
+def fingerprint() -> tuple:
+    """
+    Отпечаток состояния хранилища для кешей производных данных.
+    Учитывает и записи из этого процесса, и изменения снимка/журнала извне (mtime/размер).
+    """
+    return (str(_store_path()), _VERSION, _stamp(_store_path()), _stamp(_log_path()))
 
 
 def list_templates() -> List[dict]:
-    return _read_store()
+    return _load()[0]
 
 
 def get_template(template_id: str) -> Optional[dict]:
-    return next((tpl for tpl in _read_store() if tpl["id"] == template_id), None)
+    return _load()[1].get(template_id)
 
 
 def save_template(data: dict) -> dict:
-    templates = _read_store()
-    now = datetime.utcnow().isoformat()
+    now = _now_iso()
     template = {
         "id": str(uuid4()),
         "name": data.get("name", "Без названия"),
         "type": data.get("type", ""),
         "description": data.get("description", ""),
-        "config": data.get("config", "{}"),
+        "config": _intern_config(data.get("config", "{}")),
         "schema_version": data.get("schema_version"),
         "created_at": now,
         "updated_at": now,
         "revisions": [],
     }
-    templates.append(template)
-    _write_store(templates)
+    _append({"op": "add", "tpl": template})
     return template
 
 
 def update_template(template_id: str, data: dict) -> bool:
-    templates = _read_store()
-    updated = False
-    for template in templates:
-        if template["id"] == template_id:
-            # minimal revision history (keep last 10)
-            revs = template.get("revisions", [])
-            if isinstance(revs, list):
-                revs.append(
-                    {
-                        "updated_at": datetime.utcnow().isoformat(),
-                        "name": template.get("name"),
-                        "type": template.get("type"),
-                        "description": template.get("description"),
-                        "config": template.get("config"),
-                        "schema_version": template.get("schema_version"),
-                    }
-                )
-                template["revisions"] = revs[-10:]
-            template.update(
-                {
-                    "name": data.get("name", template["name"]),
-                    "type": data.get("type", template["type"]),
-                    "description": data.get("description", template.get("description", "")),
-                    "config": data.get("config", template["config"]),
-                    "schema_version": data.get("schema_version", template.get("schema_version")),
-                    "updated_at": datetime.utcnow().isoformat(),
-                }
-            )
-            updated = True
-            break
-    if updated:
-        _write_store(templates)
-    return updated
+    template = get_template(template_id)
+    if template is None:
+        return False
+    new_values = {
+        "name": data.get("name", template["name"]),
+        "type": data.get("type", template["type"]),
+        "description": data.get("description", template.get("description", "")),
+        "config": _intern_config(data.get("config", template["config"])),
+        "schema_version": data.get("schema_version", template.get("schema_version")),
+    }
+    # Сохранение без изменений: ни ревизии, ни записи в журнал
+    if all(template.get(key) == value for key, value in new_values.items()):
+        return True
+    now = _now_iso()
+    fields: dict[str, Any] = {}
+    # minimal revision history (keep last 10)
+    revs = template.get("revisions", [])
+    if isinstance(revs, list):
+        # deque сама вытесняет старейшую ревизию; на диск уходит обычный список
+        revs = deque(revs, maxlen=REVISIONS_LIMIT)
+        revs.append(
+            {
+                "updated_at": now,
+                "name": template.get("name"),
+                "type": template.get("type"),
+                "description": template.get("description"),
+                "config": template.get("config"),
+                "schema_version": template.get("schema_version"),
+            }
+        )
+        fields["revisions"] = list(revs)
+    fields.update(new_values)
+    fields["updated_at"] = now
+    _append({"op": "patch", "id": template_id, "fields": fields})
+    return True
 
 
 def delete_template(template_id: str) -> bool:
-    templates = _read_store()
-    new_templates = [tpl for tpl in templates if tpl["id"] != template_id]
-    if len(new_templates) == len(templates):
+    # Проверка по индексу и одна строка в журнале — без просмотра и перезаписи всего списка
+    if template_id not in _load()[1]:
         return False
-    _write_store(new_templates)
+    _append({"op": "del", "id": template_id})
     return True
 
 
@@ -109,12 +368,7 @@ def import_template(payload: dict) -> dict:
         "name": payload.get("name", "Импортированный шаблон"),
         "type": payload.get("type", ""),
         "description": payload.get("description", ""),
-        "config": payload.get("config", "{}"),
+        "config": _intern_config(payload.get("config", "{}")),
     }
-    templates = _read_store()
-    templates.append(template)
-    _write_store(templates)
+    _append({"op": "add", "tpl": template})
     return template
-
-
-
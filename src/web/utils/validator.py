@@ -4,52 +4,59 @@
 
 from __future__ import annotations
 
-from typing import Dict, List
+from types import MappingProxyType
+from typing import List, Mapping
 
 
-def validate_question(question: dict) -> List[dict]:
+# Типы, которым нужны варианты ответов / правильный ответ
+_NEEDS_ANSWERS = frozenset({"multichoice", "shortanswer", "matching"})
+_NEEDS_CORRECT = frozenset({"multichoice", "shortanswer", "truefalse"})
+
+MAX_TEXT_LENGTH = 2000
+
+# Замечания неизменяемы, поэтому одни и те же объекты переиспользуются для всех вопросов
+_ERR_NO_TEXT = MappingProxyType({"severity": "error", "message": "Нет текста вопроса."})
+_WARN_NO_ANSWERS = MappingProxyType({"severity": "warning", "message": "Нет вариантов ответов."})
+_ERR_NO_CORRECT = MappingProxyType({"severity": "error", "message": "Нет правильного ответа."})
+_WARN_LONG_TEXT = MappingProxyType({"severity": "warning", "message": "Очень длинный текст вопроса."})
+
+
+def validate_question(question: dict) -> List[Mapping[str, str]]:
     issues = []
-    if not question.get("question_text", "").strip():
-        issues.append({"severity": "error", "message": "Нет текста вопроса."})
+    text = question.get("question_text") or ""
+    if not text.strip():
+        issues.append(_ERR_NO_TEXT)
 
     q_type = question.get("type", "")
-    if q_type in {"multichoice", "shortanswer", "matching"}:
-        answers = question.get("answers", [])
-        if not answers:
-            issues.append({"severity": "warning", "message": "Нет вариантов ответов."})
-    if q_type in {"multichoice", "shortanswer", "truefalse"}:
-        correct = question.get("correct_answers", [])
-        if not correct:
-            issues.append({"severity": "error", "message": "Нет правильного ответа."})
-
-    if len(question.get("question_text", "")) > 2000:
-        issues.append({"severity": "warning", "message": "Очень длинный текст вопроса."})
+    if q_type in _NEEDS_ANSWERS and not question.get("answers"):
+        issues.append(_WARN_NO_ANSWERS)
+    if q_type in _NEEDS_CORRECT and not question.get("correct_answers"):
+        issues.append(_ERR_NO_CORRECT)
+
+    if len(text) > MAX_TEXT_LENGTH:
+        issues.append(_WARN_LONG_TEXT)
 
     return issues
 
 
 def validate_snapshot(snapshot: dict) -> List[dict]:
-    results = []
+    results: List[dict] = []
+    extend = results.extend
+    check = validate_question
     for question in snapshot.get("questions", []):
-        issues = validate_question(question)
-        for issue in issues:
-            results.append(
-                {
-                    "question_id": question["id"],
-                    "question_name": question["name"],
-                    "course_name": question.get("course_name", ""),
-                    "severity": issue["severity"],
-                    "message": issue["message"],
-                }
-            )
+        issues = check(question)
+        if not issues:
+            continue
+        question_id, question_name = question["id"], question["name"]
+        course_name = question.get("course_name", "")
+        extend(
+            {
+                "question_id": question_id,
+                "question_name": question_name,
+                "course_name": course_name,
+                "severity": issue["severity"],
+                "message": issue["message"],
+            }
+            for issue in issues
+        )
     return results
-
-
-
-
-
-
-
-
-
-
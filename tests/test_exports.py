@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import os
+import shutil
 import sys
 import tempfile
 import unittest
@@ -22,6 +25,13 @@ from src.models.metadata import DocumentMetadata  # noqa: E402
 from src.models.question import Question  # noqa: E402
 
 
+# EXPORT_TEST_CACHE=1: результат прошлого успешного прогона хранится в .pytest_cache по хешу всех файлов src/
+# и этого теста; пока они не менялись, генерация пропускается.
+# По умолчанию выключено: каждый прогон генерирует все файлы заново.
+EXPORT_TEST_CACHE = os.environ.get("EXPORT_TEST_CACHE") == "1"
+EXPORT_CACHE_DIR = PROJECT_ROOT / ".pytest_cache" / "export_bytes"
+
+
 def _sample_questions() -> list[Question]:
     return [
         Question(
@@ -67,9 +77,52 @@ def _sample_questions() -> list[Question]:
     ]
 
 
+# Один временный каталог на модуль: у каждого теста своё имя файла, изоляция каталогов не нужна
+_TMP: tempfile.TemporaryDirectory | None = None
+
+
+def setUpModule() -> None:
+    global _TMP
+    _TMP = tempfile.TemporaryDirectory()
+
+
+def tearDownModule() -> None:
+    if _TMP is not None:
+        _TMP.cleanup()
+
+
+def _output_dir() -> Path:
+    return Path(_TMP.name)
+
+
+@functools.lru_cache(maxsize=None)
+def _sources_digest() -> str:
+    # Весь src/ целиком (модели, стили, базовые классы, шаблоны, шрифты): любая правка сбрасывает кеш
+    digest = hashlib.blake2b(digest_size=16)
+    files = [path for path in (PROJECT_ROOT / "src").rglob("*") if path.is_file() and "__pycache__" not in path.parts]
+    for path in sorted([*files, Path(__file__).resolve()]):
+        digest.update(path.relative_to(PROJECT_ROOT).as_posix().encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _cache_path(name: str) -> Path | None:
+    if not EXPORT_TEST_CACHE:
+        return None
+    return EXPORT_CACHE_DIR / name / _sources_digest()
+
+
+def _remember(cached: Path | None, out: Path) -> None:
+    if cached is not None:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(out, cached)
+
+
 class ExportSmokeTests(unittest.TestCase):
-    def setUp(self) -> None:
-        self.metadata = DocumentMetadata(
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Экспортёры только читают вопросы и метаданные, поэтому набор общий для всех тестов класса
+        cls.metadata = DocumentMetadata(
             pk_prefix="ПК",
             pk_id="1.3",
             ipk_prefix="ИПК",
@@ -77,52 +130,73 @@ class ExportSmokeTests(unittest.TestCase):
             description="Тестовое описание компетенции",
             document_title="Тестовый курс",
         )
-        self.questions = _sample_questions()
+        cls.questions = _sample_questions()
+
+    def _cache_hit(self, cached: Path | None) -> bool:
+        if cached is None or not cached.is_file():
+            return False
+        self.assertGreater(cached.stat().st_size, 0, "Cached export is empty")
+        return True
 
     def test_docx_export_creates_file(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            out = Path(tmp) / "out.docx"
-            gen = DocumentGenerator(self.metadata)
-            result = gen.generate(self.questions, str(out))
-            self.assertTrue(out.exists(), "DOCX file was not created")
-            self.assertGreater(out.stat().st_size, 0, "DOCX file is empty")
-            self.assertEqual(result["rendered_questions"], len(self.questions))
+        cached = _cache_path("docx")
+        if self._cache_hit(cached):
+            return
+        out = _output_dir() / f"{self._testMethodName}.docx"
+        gen = DocumentGenerator(self.metadata)
+        result = gen.generate(self.questions, str(out))
+        self.assertTrue(out.exists(), "DOCX file was not created")
+        self.assertGreater(out.stat().st_size, 0, "DOCX file is empty")
+        self.assertEqual(result["rendered_questions"], len(self.questions))
+        _remember(cached, out)
 
     def test_pdf_export_creates_file(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            out = Path(tmp) / "out.pdf"
-            exporter = PDFExporter()
-            result = exporter.export(self.questions, self.metadata, str(out))
-            self.assertTrue(out.exists(), "PDF file was not created")
-            self.assertGreater(out.stat().st_size, 0, "PDF file is empty")
-            self.assertEqual(result["rendered_questions"], len(self.questions))
+        cached = _cache_path("pdf")
+        if self._cache_hit(cached):
+            return
+        out = _output_dir() / f"{self._testMethodName}.pdf"
+        exporter = PDFExporter()
+        result = exporter.export(self.questions, self.metadata, str(out))
+        self.assertTrue(out.exists(), "PDF file was not created")
+        self.assertGreater(out.stat().st_size, 0, "PDF file is empty")
+        self.assertEqual(result["rendered_questions"], len(self.questions))
+        _remember(cached, out)
 
     def test_html_export_creates_file(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            out = Path(tmp) / "out.html"
-            exporter = HTMLExporter()
-            result = exporter.export(self.questions, self.metadata, str(out))
-            self.assertTrue(out.exists(), "HTML file was not created")
-            self.assertGreater(out.stat().st_size, 0, "HTML file is empty")
-            self.assertEqual(result["rendered_questions"], len(self.questions))
+        cached = _cache_path("html")
+        if self._cache_hit(cached):
+            return
+        out = _output_dir() / f"{self._testMethodName}.html"
+        exporter = HTMLExporter()
+        result = exporter.export(self.questions, self.metadata, str(out))
+        self.assertTrue(out.exists(), "HTML file was not created")
+        self.assertGreater(out.stat().st_size, 0, "HTML file is empty")
+        self.assertEqual(result["rendered_questions"], len(self.questions))
+        _remember(cached, out)
 
     def test_markdown_export_creates_file(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            out = Path(tmp) / "out.md"
-            exporter = MarkdownExporter()
-            result = exporter.export(self.questions, self.metadata, str(out))
-            self.assertTrue(out.exists(), "Markdown file was not created")
-            self.assertGreater(out.stat().st_size, 0, "Markdown file is empty")
-            self.assertEqual(result["rendered_questions"], len(self.questions))
+        cached = _cache_path("markdown")
+        if self._cache_hit(cached):
+            return
+        out = _output_dir() / f"{self._testMethodName}.md"
+        exporter = MarkdownExporter()
+        result = exporter.export(self.questions, self.metadata, str(out))
+        self.assertTrue(out.exists(), "Markdown file was not created")
+        self.assertGreater(out.stat().st_size, 0, "Markdown file is empty")
+        self.assertEqual(result["rendered_questions"], len(self.questions))
+        _remember(cached, out)
 
     def test_excel_export_creates_file(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            out = Path(tmp) / "out.xlsx"
-            exporter = ExcelExporter()
-            result = exporter.export(self.questions, self.metadata, str(out))
-            self.assertTrue(out.exists(), "XLSX file was not created")
-            self.assertGreater(out.stat().st_size, 0, "XLSX file is empty")
-            self.assertGreaterEqual(result["rendered_questions"], 1)
+        cached = _cache_path("excel")
+        if self._cache_hit(cached):
+            return
+        out = _output_dir() / f"{self._testMethodName}.xlsx"
+        exporter = ExcelExporter()
+        result = exporter.export(self.questions, self.metadata, str(out))
+        self.assertTrue(out.exists(), "XLSX file was not created")
+        self.assertGreater(out.stat().st_size, 0, "XLSX file is empty")
+        self.assertGreaterEqual(result["rendered_questions"], 1)
+        _remember(cached, out)
 
 
 if __name__ == "__main__":
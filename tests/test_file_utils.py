@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import random
+import unittest
+from unittest import mock
+
+from src.utils import file_utils
+from src.utils.file_utils import clean_xml_file
+
+
+def _clean(text: str) -> str:
+    return clean_xml_file(f"<![CDATA[{text}]]>")
+
+
+class CleanXmlRegexTests(unittest.TestCase):
+    """Путь через регулярное выражение (без pyahocorasick)."""
+
+    def setUp(self) -> None:
+        patcher = mock.patch.object(file_utils, "_HTML_TAG_AUTOMATON", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_literal_lt_inside_text_is_kept(self) -> None:
+        self.assertEqual(
+            _clean("<p>Если A1<B2, то результат ИСТИНА<br>Иначе ЛОЖЬ</p>"),
+            "Если A1&lt;B2, то результат ИСТИНАИначе ЛОЖЬ",
+        )
+        self.assertEqual(_clean("a<b2<div>z"), "a&lt;b2z")
+
+    def test_tag_formed_after_removal_is_stripped(self) -> None:
+        self.assertEqual(_clean("<<p>b>"), "")
+
+    def test_case_folding_matches_re_ignorecase(self) -> None:
+        self.assertEqual(_clean("<SPAN class='x'>ok</Span>"), "ok")
+        self.assertEqual(_clean("<ſpan>x</ſpan>"), "x")
+
+
+@unittest.skipIf(file_utils.ahocorasick is None, "pyahocorasick не установлен")
+class CleanXmlAutomatonTests(unittest.TestCase):
+    """Путь через Aho-Corasick должен давать тот же результат, что и регулярное выражение."""
+
+    ADVERSARIAL = [
+        "<p>Если A1<B2, то результат ИСТИНА<br>Иначе ЛОЖЬ</p>",
+        "a<b2<div>z",
+        "<<p>b>",
+        "<ſpan>x</ſpan><İ>y</ı>",
+        "<BR/>< p>x<p<b>y>",
+        "<table><tr><td>1 < 2</td><th>x>y</th></tr></table>",
+    ]
+
+    def _both(self, text: str) -> tuple[str, str]:
+        with mock.patch.object(file_utils, "_HTML_TAG_AUTOMATON", None):
+            by_regex = _clean(text)
+        return by_regex, _clean(text)
+
+    def test_adversarial_inputs_match_regex_path(self) -> None:
+        for text in self.ADVERSARIAL:
+            with self.subTest(text=text):
+                by_regex, by_automaton = self._both(text)
+                self.assertEqual(by_automaton, by_regex)
+        self.assertEqual(_clean("a<b2<div>z"), "a&lt;b2z")
+
+    def test_random_inputs_match_regex_path(self) -> None:
+        rng = random.Random(0)
+        pieces = ["<", ">", "/", "p", "B", "r", "ſ", "İ", "span", "td", "x", " ", "<p>", "</b>", "<br/>"]
+        for _ in range(500):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 20)))
+            with self.subTest(text=text):
+                by_regex, by_automaton = self._both(text)
+                self.assertEqual(by_automaton, by_regex)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from flask import Flask
+
+from src.web.utils import template_storage
+
+
+def _storage_app(store: Path) -> Flask:
+    app = Flask(__name__)
+    app.config["TEMPLATE_STORE"] = store
+    return app
+
+
+def _compact_slowly(store: str, started) -> None:
+    """Свёртка в отдельном процессе: журнал уже прочитан, снимок ещё не записан."""
+    write_store = template_storage._write_store
+
+    def slow_write_store(data):
+        started.set()
+        time.sleep(0.5)
+        write_store(data)
+
+    template_storage._write_store = slow_write_store
+    with _storage_app(Path(store)).app_context():
+        template_storage.compact()
+
+
+@unittest.skipIf(template_storage.fcntl is None, "fcntl недоступен")
+class TemplateStorageLockTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.store = self.root / "question_templates.json"
+        self.store.write_text("[]", encoding="utf-8")
+        self.app = _storage_app(self.store)
+
+    def test_append_during_compaction_in_other_process_is_kept(self) -> None:
+        with self.app.app_context():
+            template_storage.save_template({"name": "first", "type": "essay", "config": "{}"})
+
+        ctx = multiprocessing.get_context("spawn")
+        started = ctx.Event()
+        child = ctx.Process(target=_compact_slowly, args=(str(self.store), started))
+        child.start()
+        self.addCleanup(child.join)
+        self.assertTrue(started.wait(30), "compaction did not start")
+
+        with self.app.app_context():
+            template_storage.save_template({"name": "second", "type": "essay", "config": "{}"})
+        child.join(30)
+        self.assertEqual(child.exitcode, 0)
+
+        with self.app.app_context():
+            template_storage.compact()
+            names = [tpl["name"] for tpl in template_storage.list_templates()]
+        self.assertEqual(names, ["first", "second"])
+        self.assertEqual([tpl["name"] for tpl in json.loads(self.store.read_text(encoding="utf-8"))], names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,7 @@ import unittest
 
 from src.template_engine.migration import migrate_v1_to_v2
 from src.template_engine.presets import preset_dash_answer, preset_table_default
-from src.template_engine.render_html import render_question_html
+from src.template_engine.render_html import compile_template, render_document_html, render_question_html
 from src.template_engine.validator import validate_template_config_v2
 
 
@@ -26,6 +26,30 @@ class TemplateV2Tests(unittest.TestCase):
         self.assertIn("—", html)
         self.assertIn("A", html)
 
+    def test_compiled_table_reused_across_questions(self) -> None:
+        cfg = {
+            "version": 2,
+            "blocks": [
+                {
+                    "kind": "table",
+                    "source": "answers_all",
+                    "headers": ["Вариант", "Верно"],
+                    "cols": ["{{item}}", "{{item|is_correct}}"],
+                    "col_widths_pct": [70, 30],
+                }
+            ],
+        }
+        tpl = compile_template(cfg)
+        self.assertEqual(tpl.errors, ())
+        self.assertIn("<th style='width:70%'>Вариант</th>", tpl.blocks[0]["table_open"])
+        meta = {"pk_id": "1", "ipk_id": "1.1"}
+        q1 = {"type": "multichoice", "answers": ["2", "4"], "correct_answers": ["2"]}
+        q2 = {"type": "multichoice", "answers": ["x"], "correct_answers": []}
+        doc = render_document_html([q1, q2], meta, {"multichoice": cfg}, "T")
+        self.assertIn(render_question_html(cfg, q1, meta, 1), doc)
+        self.assertIn(render_question_html(cfg, q2, meta, 2), doc)
+        self.assertIn("<td style='width:70%'>2</td><td style='width:30%'>+</td>", doc)
+
     def test_migrate_v1_to_v2(self) -> None:
         v1 = {"styles": {"header_color": "#00FF00", "title_size": 20}, "layout": {"essay_gigachat": {"table_cols_pct": [15, 15, 70]}}}
         v2 = migrate_v1_to_v2(v1, "essay_gigachat")
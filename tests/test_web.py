@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import io
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from config import BaseConfig
+from src.web import create_app
+from src.web.routes.main import _compile_search
+
+
+SAMPLE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<quiz>
+  <question type="category">
+    <category><text>$module$/top/По умолчанию для Банк вопросов курса Оценочные материалы/{course}</text></category>
+  </question>
+  <question type="shortanswer">
+    <name><text>S</text></name>
+    <questiontext><text><![CDATA[<p>Столица Франции?</p>]]></text></questiontext>
+    <answer fraction="100"><text>Париж</text></answer>
+  </question>
+</quiz>
+"""
+
+
+class SearchTests(unittest.TestCase):
+    QUESTION = "Столица Франции?"
+
+    def test_unicode_classes_match_cyrillic(self) -> None:
+        for pattern in (r"\bстолица\b", r"^\w+ франции", r"\w{7}", r"[а-я]+\s\w"):
+            with self.subTest(pattern=pattern):
+                self.assertIsNotNone(_compile_search(pattern)(self.QUESTION))
+
+    def test_plain_and_unsupported_patterns(self) -> None:
+        self.assertIsNotNone(_compile_search("ФРАН.ИИ")(self.QUESTION))
+        self.assertIsNotNone(_compile_search(r"(и)\1")(self.QUESTION))
+        self.assertIsNotNone(_compile_search(r"(?<=Фр)анц")(self.QUESTION))
+
+
+class UploadTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.root = Path(tempfile.mkdtemp())
+        root = cls.root
+
+        class TestConfig(BaseConfig):
+            TESTING = True
+            WTF_CSRF_ENABLED = False
+            UPLOAD_FOLDER = root / "uploads"
+            OUTPUT_FOLDER = root / "output"
+            TEMP_FOLDER = root / "temp"
+            DATA_FOLDER = root / "data"
+            TEMPLATE_STORE = root / "data" / "question_templates.json"
+            METADATA_STORE = root / "data" / "metadata_templates.json"
+            SESSION_FILE_DIR = root / "sessions"
+
+        for folder in ("uploads", "output", "temp", "data"):
+            (root / folder).mkdir()
+        TestConfig.TEMPLATE_STORE.write_text("[]", encoding="utf-8")
+        TestConfig.METADATA_STORE.write_text("[]", encoding="utf-8")
+        cls.app = create_app(TestConfig)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.root, ignore_errors=True)
+
+    def test_multiple_files_are_parsed_in_order(self) -> None:
+        client = self.app.test_client()
+        files = [(io.BytesIO(SAMPLE_XML.format(course=name).encode("utf-8")), f"{name}.xml") for name in ("Сети", "ОС")]
+        response = client.post("/upload", data={"xml_file": files}, content_type="multipart/form-data")
+        self.assertEqual(response.status_code, 302)
+        page = client.get("/courses").get_data(as_text=True)
+        self.assertIn("Сети", page)
+        self.assertIn("ОС", page)
+        files_page = client.get("/files").get_data(as_text=True)
+        self.assertLess(files_page.index("ОС.xml"), files_page.index("Сети.xml"))
+
+
+if __name__ == "__main__":
+    unittest.main()